@@ -1,48 +1,245 @@
 import pandas as pd
+import numpy as np
 import openai
 from collections import defaultdict
+import argparse
+import array
+import asyncio
+import hashlib
+import itertools
 import json
 import os
+import random
+import re
+import sqlite3
+import sys
 import time
 
+# Gemeinsames Metrik-Modul mit den NER-Skripten (ner_scripts/ingestion/metrics.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "ner_scripts"))
+from ingestion.metrics import Metrics
+
 client = openai.OpenAI(api_key="insert_personal_api_key", base_url = "https://ki-toolbox.scc.kit.edu/api/v1") 
+MODEL = "kit.gpt-oss-120b"
+TEMPERATURE = 0.2
 
-def ask_openai_tool(prompt, tool_name, tool_spec, entity=None):
+# Persistenter Cache für die Antworten des Modells (SQLite). Schlüssel ist der Hash aus Prompt, Tool-Name,
+# Tool-Schema, Modell und Temperatur, gespeichert werden die bereits geparsten Argumente des Funktionsaufrufs.
+# So werden identische Anfragen (gleiche Person im gleichen Satz, Neustart nach Absturz) nur einmal bezahlt.
+class ResponseCache:
 
-    try:
-        response = client.chat.completions.create(
-            model="kit.gpt-oss-120b",
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            tools=[
-                {"type": "function", "function": tool_spec}
-            ],
-            tool_choice={
-                "type": "function",
-                "function": {"name": tool_name}
-            },
-            temperature=0.2
+    def __init__(self, filename, max_age_days=None):
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, model TEXT NOT NULL, tool_name TEXT NOT NULL, arguments TEXT NOT NULL, "
+            "created REAL NOT NULL)"
         )
-        
-        # ---- DEBUGGING: Anzeige vollständige 
-        #print("🟢 Vollständige Antwort:", response)
+        self.connection.commit()
+        self.max_age = max_age_days * 86400 if max_age_days is not None else None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(prompt, tool_name, tool_spec, model, temperature):
+        request = json.dumps([prompt, tool_name, tool_spec, model, temperature], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+    def get(self, prompt, tool_name, tool_spec, model, temperature):
+        row = self.connection.execute(
+            "SELECT arguments, created FROM responses WHERE key = ?",
+            (self.key(prompt, tool_name, tool_spec, model, temperature),)
+        ).fetchone()
+        # Abgelaufene Einträge zählen als nicht vorhanden und werden beim nächsten put überschrieben
+        if row is None or (self.max_age is not None and time.time() - row[1] > self.max_age):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, prompt, tool_name, tool_spec, model, temperature, arguments):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (self.key(prompt, tool_name, tool_spec, model, temperature), model, tool_name,
+                 json.dumps(arguments, ensure_ascii=False), time.time())
+            )
+
+    # Löscht alle Antworten eines Modells (oder alle, wenn kein Modell angegeben ist)
+    def invalidate(self, model=None):
+        with self.connection:
+            if model is None:
+                cursor = self.connection.execute("DELETE FROM responses")
+            else:
+                cursor = self.connection.execute("DELETE FROM responses WHERE model = ?", (model,))
+        return cursor.rowcount
+
+    def close(self):
+        self.connection.close()
+
+response_cache = None
+# Metriken des Laufs (Zeit pro Stufe, Latenz pro Frage), gesetzt im Hauptprogramm
+run_metrics = Metrics()
+
+# Tokens einer Antwort laut Server, sonst geschätzt
+def response_tokens(response, prompt, tool_spec):
+    usage = getattr(response, "usage", None)
+    total = getattr(usage, "total_tokens", None)
+    return total if isinstance(total, int) else estimate_tokens(prompt, tool_spec)
+
+# Backends beantworten die Fragen an ein Modell. ask_batch erhält eine Liste von Anfragen (prompt, tool_name,
+# tool_spec) und liefert pro Anfrage (Argumente des Funktionsaufrufs als dict oder None bei einem Fehler, Tokens,
+# Sekunden für diese Anfrage).
+# model und temperature gehören zum Schlüssel im ResponseCache, damit Antworten verschiedener Backends getrennt bleiben.
+
+# Chat-Completions-API mit Funktionsaufruf: die KI-Toolbox oder ein kompatibler Server (z. B. ein lokal laufendes,
+# quantisiertes Modell oder mock_openai_server.py). delay: Pause nach jeder Anfrage, um Limits des Servers einzuhalten.
+class OpenAIBackend:
+
+    def __init__(self, client, model, temperature=TEMPERATURE, delay=0.0):
+        self.client = client
+        self.model = model
+        self.temperature = temperature
+        self.delay = delay
+
+    # Die Dauer misst nur die Anfrage selbst, ohne die Pause danach
+    def ask(self, prompt, tool_name, tool_spec):
+        start = time.perf_counter()
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                tools=[
+                    {"type": "function", "function": tool_spec}
+                ],
+                tool_choice={
+                    "type": "function",
+                    "function": {"name": tool_name}
+                },
+                temperature=self.temperature
+            )
+
+            # ---- DEBUGGING: Anzeige vollständige 
+            #print("🟢 Vollständige Antwort:", response)
+
+            tool_call = response.choices[0].message.tool_calls[0]
+            return (json.loads(tool_call.function.arguments), response_tokens(response, prompt, tool_spec),
+                    time.perf_counter() - start)
+
+        except Exception as e:
+            print(f"❌ Fehler: {e}")
+            return None, 0, time.perf_counter() - start
+
+        finally:
+            time.sleep(self.delay)
+
+    def ask_batch(self, requests):
+        return [self.ask(*request) for request in requests]
+
+# Lokaler Klassifikator auf der CPU, z. B. ein feinjustiertes Transformer-Modell (Verzeichnis oder Name im Hugging Face
+# Hub), das die Prompts einer Frage klassifiziert. Die Anfragen eines Blocks werden in einem Durchlauf gerechnet. Nur
+# für Fragen mit genau einer Antwort (LOCAL_QUESTIONS); die Labels des Modells sind die Werte der Antwort ("aktiv",
+# "passiv", "true", "false", ...) oder LABEL_i für den i-ten Wert (bei Ja/Nein-Fragen LABEL_0 = false). Da ein Block
+# gemeinsam gerechnet wird, ist die Dauer pro Anfrage amortisiert: die Dauer des Blocks geteilt durch seine Größe.
+# Braucht transformers und torch.
+class TransformersBackend:
+
+    def __init__(self, model, batch_size=32):
+        from transformers import pipeline
+
+        self.pipeline = pipeline("text-classification", model=model, device=-1)
+        self.model = f"transformers:{model}"
+        self.temperature = None
+        self.batch_size = batch_size
 
-        tool_call = response.choices[0].message.tool_calls[0]
-        arguments = json.loads(tool_call.function.arguments)
+    def ask_batch(self, requests):
+        start = time.perf_counter()
+        try:
+            outputs = self.pipeline([prompt for prompt, _, _ in requests], batch_size=self.batch_size, truncation=True)
+        except Exception as e:
+            print(f"❌ Fehler: {e}")
+            return [(None, 0, (time.perf_counter() - start) / len(requests)) for _ in requests]
+        seconds = (time.perf_counter() - start) / len(requests)
+        return [(answer_from_label(output["label"], tool_spec), estimate_tokens(prompt, tool_spec), seconds)
+                for (prompt, _, tool_spec), output in zip(requests, outputs)]
 
-        return arguments
+# Fragen, die ein lokaler Klassifikator beantworten kann (eine Antwort pro Anfrage)
+LOCAL_QUESTIONS = ["is_author", "is_person", "is_passive_actor", "is_same_person"]
 
-    except Exception as e:
-        print(f"❌ Fehler: {e}")
+# Antwort im Format des Funktionsaufrufs aus dem Label eines Klassifikators
+def answer_from_label(label, tool_spec):
+    (key, schema), = tool_spec["parameters"]["properties"].items()
+    values = schema.get("enum", [False, True])
+    match = re.fullmatch(r"LABEL_(\d+)", label)
+    if match and int(match.group(1)) < len(values):
+        return {key: values[int(match.group(1))]}
+    if schema["type"] == "boolean":
+        return {key: label.lower() in ("true", "ja", "yes", "1")}
+    if label in values:
+        return {key: label}
+    print(f"❌ Fehler: Label {label} passt zu keinem Wert von {key}")
+    return None
 
-    finally:
-      time.sleep(1)
+# Backend aus der Angabe in --backend: "openai:MODELL@URL" für einen kompatiblen Server oder "transformers:MODELL"
+def make_backend(spec, batch_size=32):
+    kind, _, target = spec.partition(":")
+    if kind == "openai" and "@" in target:
+        model, base_url = target.split("@", 1)
+        return OpenAIBackend(openai.OpenAI(api_key=client.api_key, base_url=base_url), model)
+    if kind == "transformers" and target:
+        return TransformersBackend(target, batch_size)
+    raise ValueError(f"Unbekanntes Backend {spec}; erwartet openai:MODELL@URL oder transformers:MODELL")
+
+# Standard für alle Fragen ist die KI-Toolbox mit einer Sekunde Pause nach jeder Anfrage; backends enthält
+# abweichende Backends pro Frage (tool_name), gesetzt im Hauptprogramm
+default_backend = OpenAIBackend(client, MODEL, delay=1.0)
+backends = {}
+
+def backend_for(tool_name):
+    return backends.get(tool_name, default_backend)
+
+# Antwort aus dem ResponseCache oder None
+def cached_answer(backend, prompt, tool_name, tool_spec):
+    if response_cache is None:
+        return None
+    cached = response_cache.get(prompt, tool_name, tool_spec, backend.model, backend.temperature)
+    if cached is not None:
+        run_metrics.add_request(tool_name, 0.0, cached=True)
+    return cached
+
+# Metriken und Cache für die Antworten eines Blocks; jede Anfrage wird mit ihrer eigenen Dauer aus ask_batch gezählt
+def store_answers(backend, requests, answers):
+    for (prompt, tool_name, tool_spec), (arguments, tokens, seconds) in zip(requests, answers):
+        run_metrics.add_request(tool_name, seconds, tokens, failed=arguments is None)
+        if arguments is not None and response_cache is not None:
+            response_cache.put(prompt, tool_name, tool_spec, backend.model, backend.temperature, arguments)
+
+# Beantwortet mehrere Anfragen: zuerst aus dem Cache, die übrigen pro Backend in einem Block
+def ask_many(requests):
+    answers = [None] * len(requests)
+    misses = defaultdict(list)
+    for position, request in enumerate(requests):
+        backend = backend_for(request[1])
+        answers[position] = cached_answer(backend, *request)
+        if answers[position] is None:
+            misses[backend].append(position)
+    for backend, positions in misses.items():
+        batch = [requests[position] for position in positions]
+        results = backend.ask_batch(batch)
+        store_answers(backend, batch, results)
+        for position, (arguments, _, _) in zip(positions, results):
+            answers[position] = arguments
+    return answers
+
+def ask_openai_tool(prompt, tool_name, tool_spec, entity=None):
+    return ask_many([(prompt, tool_name, tool_spec)])[0]
       
 # Hinweis: 
 # Erkennt häufig fälschlicherweise Buchautoren oder Schriftsteller als Autoren des Artikels
 # Erkennt Großschreibung teilweise fälschlicherweise als Autor (das Problem wird jedoch durch die spätere Prüfung auf reale Personennamen beseitigt)
-def is_author(sentence, entity):
+def author_request(sentence, entity):
     prompt = (
         f"Du erhältst einen Satz aus einem Artikel. Entscheide, ob der Name '{entity}' höchstwahrscheinlich Autor, Interviewer, Fotograf, Illustrator oder Editor des Artikels ist.\n"
         "Sind mehrere Personen am Artikel beteiligt, sind sie oft nacheinander aufgelistet."
@@ -62,11 +259,15 @@ def is_author(sentence, entity):
             "required": ["is_author"]
         }
     }
-    result = ask_openai_tool(prompt, "is_author", tool_spec, entity)
+    return prompt, "is_author", tool_spec
+
+def is_author(sentence, entity):
+    prompt, tool_name, tool_spec = author_request(sentence, entity)
+    result = ask_openai_tool(prompt, tool_name, tool_spec, entity)
     print(f"✍️  {result}")
     return result.get("is_author", False)
 
-def is_person(entity, sentence):
+def person_request(entity, sentence):
     prompt = (
         f"Ist '{entity}' im folgenden Text der Name einer realen Person? "
         "Beachte: Es geht nicht um Berufsbezeichnungen oder Rollen, sondern nur um echte Personennamen.\n\n"
@@ -88,16 +289,21 @@ def is_person(entity, sentence):
             "required": ["type"]
         }
     }
-    result = ask_openai_tool(prompt, "is_person", tool_spec, entity)
+    return prompt, "is_person", tool_spec
+
+def is_person(entity, sentence):
+    prompt, tool_name, tool_spec = person_request(entity, sentence)
+    result = ask_openai_tool(prompt, tool_name, tool_spec, entity)
     print(f"👤  {result}")
     return result.get("type") == "Name einer Person"
 
-def is_same_person(entity1, sentence1, entity2, sentence2):
+# context: Sätze um beide Nennungen (SentenceIndex.text); ersetzt dann die beiden einzelnen Sätze
+def same_person_request(entity1, sentence1, entity2, sentence2, context=None):
+    texts = f"Text 1: {sentence1}\nText 2: {sentence2}\n" if context is None else f"Kontext:\n{context}\n"
     prompt = (
         f"Sind '{entity1}' "
         f"und '{entity2}' potenziell die gleiche Person?\n"
-        f"Text 1: {sentence1}\n"
-        f"Text 2: {sentence2}\n"
+        + texts +
         "Gib eine strukturierte Antwort."
     )
     tool_spec = {
@@ -111,15 +317,21 @@ def is_same_person(entity1, sentence1, entity2, sentence2):
             "required": ["same_person"]
         }
     }
-    result = ask_openai_tool(prompt, "is_same_person", tool_spec, f"{entity1} <-> {entity2}")
+    return prompt, "is_same_person", tool_spec
+
+def is_same_person(entity1, sentence1, entity2, sentence2):
+    prompt, tool_name, tool_spec = same_person_request(entity1, sentence1, entity2, sentence2)
+    result = ask_openai_tool(prompt, tool_name, tool_spec, f"{entity1} <-> {entity2}")
     print(f"🟰  {result}")
     return result.get("same_person", False)
 
-def is_passive_actor(entity, sentence):
+# context: Sätze vor und nach dem Satz der Entität (SentenceIndex.text), sonst nur der Satz selbst
+def passive_actor_request(entity, sentence, context=None):
  
     prompt = (
         f"Bewerte, ob die Person '{entity}' im folgenden Text eine aktive oder passive Rolle einnimmt.\n\n"
-        f"Kontext: '{sentence}'\n\n"
+        + (f"Kontext: '{sentence}'\n\n" if context is None else
+           f"Satz: '{sentence}'\n\nKontext (Sätze davor und danach, mit Satznummer):\n{context}\n\n") +
         "Definitionen:\n"
         "Passiv heißt:\n"
         "- Es wird lediglich die Handlung der Person oder etwas, das ihr passiert ist, beschrieben\n"
@@ -154,94 +366,1440 @@ def is_passive_actor(entity, sentence):
         }
     }
 
-    result = ask_openai_tool(prompt, "is_passive_actor", tool_spec, entity)
+    return prompt, "is_passive_actor", tool_spec
+
+def is_passive_actor(entity, sentence):
+    prompt, tool_name, tool_spec = passive_actor_request(entity, sentence)
+    result = ask_openai_tool(prompt, tool_name, tool_spec, entity)
     print(f"💬  {result}")
     return result.get("role") == "passiv"
 
 
 
-if __name__ == "__main__":
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    dataset_name = input('Name of the file with the actors?')
-    file_path = os.path.join(script_dir, "daten", dataset_name)
-    
-    df = pd.read_csv(file_path)
-    pd.set_option('display.max_columns', None)
-    print(df)
-    
-    grouped = df.groupby("document_id")
-    for doc_id, group in grouped:
-  
-        # if doc_id < 5: # not in ["1"]:
-          #  continue
-        
-        print("##############################")
-        print(doc_id)
-       
-        #seen_entities = defaultdict(list)
-        max_sentence_id = group['sentence_id'].max()
+# Lokale Vorfilter: Regeln und Lexika, die eindeutige Fälle ohne Anfrage an das Modell entscheiden.
+# Die Listen lassen sich um Dateien (ein Eintrag pro Zeile) in daten/lexika/ ergänzen, siehe load_lexicons.
+FIRST_NAMES = {
+    "alexander", "andrea", "andreas", "angela", "anna", "anne", "barbara", "bernd", "birgit", "brigitte", "christian",
+    "christiane", "christina", "christine", "claudia", "daniel", "daniela", "david", "dieter", "dirk", "elisabeth",
+    "emma", "eva", "felix", "florian", "frank", "franz", "gabriele", "georg", "gerhard", "hans", "heike", "heinz",
+    "helmut", "ingrid", "jan", "jana", "jens", "johanna", "johannes", "jonas", "jörg", "josef", "julia", "jürgen",
+    "karin", "karl", "katharina", "klaus", "lara", "laura", "lea", "leon", "lisa", "lukas", "manfred", "maria",
+    "marie", "markus", "martin", "martina", "matthias", "max", "michael", "monika", "nicole", "niklas", "olaf",
+    "paul", "peter", "petra", "ralf", "renate", "sabine", "sandra", "sarah", "sebastian", "stefan", "stefanie",
+    "stephan", "susanne", "sven", "thomas", "tim", "tobias", "torsten", "ulrich", "ursula", "uwe", "werner",
+    "wolfgang"
+}
+ROLE_WORDS = {
+    "arzt", "ärztin", "autor", "autorin", "bundeskanzler", "bundeskanzlerin", "bürgermeister", "bürgermeisterin",
+    "chef", "chefin", "direktor", "direktorin", "doktor", "dr", "experte", "expertin", "forscher", "forscherin",
+    "frau", "herr", "journalist", "journalistin", "kanzler", "kanzlerin", "minister", "ministerin", "präsident",
+    "präsidentin", "prof", "professor", "professorin", "redakteur", "redakteurin", "sprecher", "sprecherin",
+    "virologe", "virologin", "wissenschaftler", "wissenschaftlerin"
+}
+HISTORICAL_FIGURES = {
+    "ada lovelace", "adenauer", "adolf hitler", "albert einstein", "alexander fleming", "alexander von humboldt",
+    "alfred nobel", "aristoteles", "barbarossa", "bismarck", "charles darwin", "darwin", "edward jenner", "einstein",
+    "emil von behring", "florence nightingale", "freud", "galileo galilei", "goethe", "gregor mendel", "hippokrates",
+    "hitler", "immanuel kant", "isaac newton", "johann wolfgang von goethe", "karl marx", "konrad adenauer",
+    "leonardo da vinci", "lise meitner", "louis pasteur", "marie curie", "max planck", "napoleon", "otto hahn",
+    "otto von bismarck", "paul ehrlich", "pasteur", "robert koch", "rudolf virchow", "sigmund freud", "sokrates",
+    "virchow", "werner heisenberg", "wilhelm conrad röntgen"
+}
+# Nur eindeutige Verben der Rede; "so" und "laut" stehen auch vor Institutionen ("laut Robert Koch-Institut") oder
+# haben eine andere Bedeutung
+SPEECH_VERBS = {
+    "bestätigt", "bestätigte", "betont", "betonte", "erklärt", "erklärte", "erläutert", "erläuterte", "ergänzt",
+    "ergänzte", "fordert", "forderte", "glaubt", "glaubte", "kritisiert", "kritisierte", "mahnt", "mahnte",
+    "meint", "meinte", "rät", "riet", "sagt", "sagte", "schätzt", "schätzte", "sprach", "vermutet",
+    "vermutete", "warnt", "warnte", "zufolge"
+}
+KONJUNKTIV_VERBS = {"dürfe", "gebe", "habe", "könne", "müsse", "sei", "seien", "solle", "werde", "wolle"}
+QUOTATION_MARKS = "\"„“”«»‚‘’"
+YEAR_PATTERN = re.compile(r"\b(?:1[5-9]\d\d|20[0-2]\d)\b")
+WORD_PATTERN = re.compile(r"\w+")
+
+# Ergänzt die Lexika um die Einträge aus first_names.txt, role_words.txt und historical_figures.txt in directory
+def load_lexicons(directory):
+    for filename, lexicon in [("first_names.txt", FIRST_NAMES), ("role_words.txt", ROLE_WORDS),
+                              ("historical_figures.txt", HISTORICAL_FIGURES)]:
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                lexicon.update(line.strip().lower() for line in file if line.strip())
+
+# Wörter im Umkreis von window Wörtern um die (erste) Nennung der Entität im Satz
+def words_around(entity, sentence, window=4):
+    position = sentence.find(entity)
+    if position == -1:
+        return []
+    before = WORD_PATTERN.findall(sentence[:position])[-window:]
+    after = WORD_PATTERN.findall(sentence[position + len(entity):])[:window]
+    return [word.lower() for word in before + after]
+
+# Antworten, die sich lokal bestimmen lassen, im Format von normalize_answer, und die Stufe, die sie geliefert hat.
+# Die Byline gilt immer, die übrigen Regeln nur mit rules=True. Mit rules=True ergänzt das Akteursregister (siehe
+# ActorRegistry, nur mit --registry) is_person, wenn die Regeln es offen lassen; Autor und Rolle hängen von der
+# Nennung ab und kommen nie aus dem Register. source bleibt für die Signatur der Kaskaden erhalten.
+def local_answers(entity, sentence, check_author, byline, rules=True, source=None):
+    answers, stages = rule_answers(entity, sentence, check_author, byline, rules)
+    if rules and actor_registry is not None and "is_person" not in answers:
+        known = actor_registry.is_person(entity)
+        if known is not None:
+            answers["is_person"] = known
+            stages["is_person"] = "registry"
+    return answers, stages
+
+def rule_answers(entity, sentence, check_author, byline, rules=True):
+    answers, stages = {}, {}
+
+    def settle(key, value, stage):
+        answers[key] = value
+        stages[key] = stage
+
+    if check_author and pd.notna(byline) and entity in str(byline):
+        settle("is_author", True, "byline")
+    if not rules:
+        return answers, stages
+    tokens = entity.split()
+    normalized = " ".join(tokens).lower().strip(".,;:")
+    letters = [c for c in entity if c.isalpha()]
+    # Autorenzeilen stehen oft in Großbuchstaben
+    if check_author and "is_author" not in answers and len(letters) > 3 and entity.isupper() and len(tokens) > 1:
+        settle("is_author", True, "rule:caps_author")
+    if not letters or any(c.isdigit() for c in entity):
+        settle("is_person", False, "rule:no_name")
+    elif normalized in HISTORICAL_FIGURES:
+        settle("is_person", True, "gazetteer:historical")
+        settle("role", "passiv", "gazetteer:historical")
+    elif len(tokens) == 1 and normalized in ROLE_WORDS:
+        settle("is_person", False, "lexicon:role_word")
+    elif len(tokens) == 1 and normalized in FIRST_NAMES:
+        settle("is_person", True, "lexicon:first_name")
+    # Direkte oder indirekte Rede direkt bei der Entität, ohne Jahreszahl (Aussage könnte Jahre zurückliegen). Ob die
+    # Entität eine Person ist, entscheidet die Regel nicht, das fragt weiterhin das Modell.
+    if "role" not in answers and answers.get("is_person", True) and not YEAR_PATTERN.search(sentence):
+        words = set(words_around(entity, sentence))
+        quoted = any(mark in sentence for mark in QUOTATION_MARKS)
+        if words & SPEECH_VERBS or (quoted and words & KONJUNKTIV_VERBS):
+            settle("role", "aktiv", "rule:speech")
+    return answers, stages
+
+# Übersetzt eine Antwort des Modells (einzeln oder kombiniert) in das Format der lokalen Antworten
+def normalize_answer(result):
+    answers = {}
+    if "is_author" in result:
+        answers["is_author"] = bool(result["is_author"])
+    if "type" in result:
+        answers["is_person"] = result["type"] == "Name einer Person"
+    if "role" in result:
+        answers["role"] = result["role"]
+    return answers
+
+# Codierung der Zeile aus den Antworten; decided_by ist die Stufe der Antwort, die den Ausschlag gegeben hat,
+# person_decided_by die Stufe der Antwort auf is_person (für das Akteursregister). Liefert None, solange eine dafür
+# nötige Antwort fehlt.
+def verdict_from_answers(answers, check_author, stages=None):
+    stages = stages or {}
+    verdict = {}
+    if check_author:
+        if "is_author" not in answers:
+            return None
+        if answers["is_author"]:
+            return {"journalist": True, "relevant": False, "decided_by": stages.get("is_author", "llm")}
+        verdict["journalist"] = False
+    if "is_person" not in answers:
+        return None
+    verdict["person_decided_by"] = stages.get("is_person", "llm")
+    if not answers["is_person"]:
+        verdict.update(misclassification=True, relevant=False, decided_by=stages.get("is_person", "llm"))
+        return verdict
+    if "role" not in answers:
+        return None
+    if answers["role"] == "passiv":
+        verdict.update(passive_actor=True, relevant=False)
+    else:
+        verdict["relevant"] = True
+    verdict["decided_by"] = stages.get("role", "llm")
+    return verdict
+
+# Index der Sätze eines Artikels, einmal pro document_id aufgebaut (sentences_joined wird dafür nur einmal geteilt).
+# window liefert das Fenster aus bis zu k Sätzen vor und nach einem Satz, das nach außen nur so weit wächst, wie das
+# Budget von max_tokens (geschätzt wie estimate_tokens) reicht; der Satz selbst ist immer enthalten. Fenster und Texte
+# werden pro Artikel gemerkt, Entitäten mit demselben Fenster teilen denselben Kontext (und damit Cache-Einträge).
+class SentenceIndex:
+
+    def __init__(self, sentences, k=1, max_tokens=300):
+        self.sentences = sentences
+        self.k = k
+        self.max_tokens = max_tokens
+        self.windows = {}
+        self.texts = {}
+
+    # sentences_joined der ersten Zeile oder, falls nicht geladen, die Sätze der Zeilen von group
+    @classmethod
+    def from_group(cls, group, k=1, max_tokens=300):
+        if 'sentences_joined' in group and pd.notna(group['sentences_joined'].iloc[0]):
+            sentences = dict(enumerate(str(group['sentences_joined'].iloc[0]).split("<->"), 1))
+        else:
+            sentences = dict(zip(group['sentence_id'], group['sentence']))
+        return cls(sentences, k, max_tokens)
 
-        for idx, row in group.iterrows():
-            entity = row['entity']
-            sentence = row['sentence']
-            sentence_id = row['sentence_id']
-
-            print("\n###")
-            print(entity)
-            print(sentence)
-
-            # Ist die Entity ein Journalist? (Wir prüfen das nur für den Anfang und Ende eines Artikels, da hier am wahrscheinlichsten die Autoren stehen))
-            if sentence_id == 1 or sentence_id == max_sentence_id:
-                # Ignoriere diese Entität und springe zur nächsten Entität, wenn es sich um einen Journalisten handelt
-                # Wenn die Entität in Byline des Artikels vorkommt, ist es automatisch ein Journalist und wir können uns die ChatGPT-Abfrage sparen
-                if pd.notna(row.get('article_byline')) and entity in str(row['article_byline']):
-                    df.at[idx, 'journalist'] = True
-                    df.at[idx, 'relevant'] = False
-                    continue 
+    def tokens(self, sentence_id):
+        return len(self.sentences.get(sentence_id, "")) // 4 + 1
+
+    # (erster, letzter) Satz des Fensters um sentence_id; abwechselnd davor und danach um je einen Satz erweitert
+    def window(self, sentence_id):
+        if sentence_id not in self.windows:
+            first = last = sentence_id
+            budget = self.max_tokens - self.tokens(sentence_id)
+            grow_before = grow_after = True
+            for _ in range(self.k):
+                if grow_before:
+                    grow_before = first - 1 in self.sentences and self.tokens(first - 1) <= budget
+                    if grow_before:
+                        first -= 1
+                        budget -= self.tokens(first)
+                if grow_after:
+                    grow_after = last + 1 in self.sentences and self.tokens(last + 1) <= budget
+                    if grow_after:
+                        last += 1
+                        budget -= self.tokens(last)
+            self.windows[sentence_id] = (first, last)
+        return self.windows[sentence_id]
+
+    # Text der Fenster um sentence_ids mit Satznummern. Überlappende oder aneinandergrenzende Fenster werden
+    # zusammengefasst, damit kein Satz doppelt im Prompt steht; Lücken werden mit "[...]" markiert.
+    def text(self, *sentence_ids):
+        windows = tuple(sorted({self.window(sentence_id) for sentence_id in sentence_ids}))
+        if windows not in self.texts:
+            spans = []
+            for first, last in windows:
+                if spans and first <= spans[-1][1] + 1:
+                    spans[-1][1] = max(spans[-1][1], last)
                 else:
-                    author_check = is_author(sentence, entity)
-                    if author_check:
-                        df.at[idx, 'journalist'] = True
-                        df.at[idx, 'relevant'] = False
-                        continue 
-                    else: 
-                        df.at[idx, 'journalist'] = False
-
-            # TODO: Duplikatscheck: Ganz am Ende, dann erste Schreibweise, die auftritt (niedrigste enitity_id)
-            # TODO: Aus sentences joined: previous sentence_id, next sentence_id
-            # Duplicate & Missclassification?
-            
-            #parts = entity.split()
-            #found = False
-            #for seen_entity, seen_idx in seen_entities[doc_id]:
-            #    if seen_entity == entity and df.at[seen_idx, 'relevant']:
-            #        df.at[idx, 'duplicate'] = True
-            #        found = True
-            #        break
-            #    elif (entity in seen_entity or seen_entity in entity) and df.at[seen_idx, 'relevant']:
-            #        if is_same_person(entity, sentence, seen_entity, df.at[seen_idx, 'sentence']):
-            #            df.at[idx, 'duplicate'] = True
-            #            found = True
-            #            break
-            #if found:
-            #    continue
-
-            # Springe zur nächsten Entität, wenn es sich um keine reale Person handelt
-            if not is_person(entity, sentence):
-                df.at[idx, 'misclassification'] = True
-                df.at[idx, 'relevant'] = False
+                    spans.append([first, last])
+            self.texts[windows] = "\n[...]\n".join(
+                "\n".join(f"[{sentence_id}] {self.sentences[sentence_id]}"
+                          for sentence_id in range(first, last + 1) if sentence_id in self.sentences)
+                for first, last in spans
+            )
+        return self.texts[windows]
+
+# Entscheidungskaskade für eine Entität als Generator: Er gibt die nächste Anfrage (prompt, tool_name, tool_spec)
+# zurück, erhält die Antwort des Modells per send() und liefert am Ende die Codierung der Zeile als dict.
+# So nutzen der serielle und der asynchrone Ablauf dieselbe Logik. Fragen, die die lokalen Vorfilter schon
+# beantworten, werden nicht gestellt. Schlägt eine Anfrage fehl (Antwort None), bleibt der Rest der Zeile uncodiert.
+# context: Sätze um den Satz der Entität (SentenceIndex.text) für die Frage nach der aktiven oder passiven Rolle.
+def classify_entity(entity, sentence, sentence_id, max_sentence_id, byline, rules=True, source=None, context=None):
+    # Ist die Entity ein Journalist? (Wir prüfen das nur für den Anfang und Ende eines Artikels, da hier am wahrscheinlichsten die Autoren stehen))
+    # Wenn die Entität in Byline des Artikels vorkommt, ist es automatisch ein Journalist und wir können uns die ChatGPT-Abfrage sparen
+    check_author = sentence_id == 1 or sentence_id == max_sentence_id
+    answers, stages = local_answers(entity, sentence, check_author, byline, rules, source)
+    questions = [("is_author", author_request(sentence, entity))] if check_author else []
+    # Keine reale Person: Missklassifikation; danach: Ist die Entität ein aktiver oder passiver Akteur?
+    questions += [("is_person", person_request(entity, sentence)), ("role", passive_actor_request(entity, sentence, context))]
+    for key, request in questions:
+        verdict = verdict_from_answers(answers, check_author, stages)
+        if verdict is not None:
+            return verdict
+        if key in answers:
+            continue
+        result = yield request
+        if result is None:
+            # Bereits feststehende Teile der Codierung behalten
+            return {"journalist": False} if check_author and answers.get("is_author") is False else {}
+        answers[key] = normalize_answer(result).get(key, False if key != "role" else "aktiv")
+    return verdict_from_answers(answers, check_author, stages)
+
+# Fragen und Definitionen der kombinierten Anfragen (eine Entität oder alle Entitäten eines Artikels)
+AUTHOR_QUESTION = (
+    "Ist die Person höchstwahrscheinlich Autor, Interviewer, Fotograf, Illustrator oder Editor des Artikels? "
+    "Sind mehrere Personen am Artikel beteiligt, sind sie oft nacheinander aufgelistet. "
+    "Die Namen von Autoren, Fotografen und Illustratoren sind oft in Großbuchstaben geschrieben. "
+    "Interviewer ist die Person, die ein Gespräch oder Interview geführt hat."
+)
+PERSON_QUESTION = (
+    "Ist es der Name einer realen Person? "
+    "Es geht nicht um Berufsbezeichnungen oder Rollen, sondern nur um echte Personennamen. "
+    "Entscheide im Zweifelsfall immer, dass es sich um den Namen einer realen Person handelt."
+)
+ROLE_QUESTION = (
+    "Nimmt die Person eine aktive oder passive Rolle ein?\n"
+    "Passiv heißt:\n"
+    "- Es wird lediglich die Handlung der Person oder etwas, das ihr passiert ist, beschrieben\n"
+    "- Die Person macht keine konkrete Aussage\n"
+    "- Es handelt sich um eine historische Persönlichkeit (z. B. Robert Koch, Barbarossa)\n"
+    "- Die Aussage der Person liegt mehrere Jahre zurück\n"
+    "Aktiv heißt:\n"
+    "- Die Person kommt direkt über ein Zitat zu Wort\n"
+    "- Die Person wird indirekt zitiert (erkennbar an Konjunktiv und paraphrasierten Aussagen)\n"
+    "- Es werden Studien erwähnt, die eine als Wissenschaftler arbeitende Person verfasst hat\n"
+    "Wähle im Zweifelsfall immer \"passiv\"."
+)
+COMBINED_PROPERTIES = {
+    "is_author": {"type": "boolean"},
+    "type": {"type": "string", "enum": ["Name einer Person", "Kein Name einer Person"]},
+    "role": {"type": "string", "enum": ["aktiv", "passiv"]}
+}
+# Werte für Felder, die in einer Antwort fehlen (wie result.get(...) in den einzelnen Fragen)
+COMBINED_DEFAULTS = {"is_author": False, "is_person": False, "role": "aktiv"}
+
+# Alle drei Fragen (Autor, Person, aktiv/passiv) in einer einzigen Anfrage mit einem gemeinsamen Tool-Schema.
+# Die Autorenfrage wird nur für den ersten und letzten Satz gestellt, wie in der Kaskade mit drei Anfragen.
+def combined_request(entity, sentence, check_author, context=None):
+    questions = [AUTHOR_QUESTION] if check_author else []
+    questions += [PERSON_QUESTION, ROLE_QUESTION]
+    properties = {key: value for key, value in COMBINED_PROPERTIES.items() if check_author or key != "is_author"}
+    prompt = (
+        f"Du erhältst einen Satz aus einem Artikel. Beantworte die folgenden Fragen zu '{entity}'.\n\n"
+        f"Satz: '{sentence}'\n\n"
+        + (f"Kontext (Sätze davor und danach, mit Satznummer):\n{context}\n\n" if context is not None else "")
+        + "\n\n".join(f"{i}. {question}" for i, question in enumerate(questions, 1)) +
+        "\n\nBitte gib das Ergebnis als Funktionsaufruf zurück."
+    )
+    tool_spec = {
+        "name": "classify_entity",
+        "description": "Beurteile die genannte Person im Satz: Autor des Artikels, realer Personenname, aktive oder passive Rolle.",
+        "parameters": {
+            "type": "object",
+            "properties": properties,
+            "required": list(properties)
+        }
+    }
+    return prompt, "classify_entity", tool_spec
+
+# Kaskade mit einer einzigen Anfrage, liefert Codierungen im selben Format wie classify_entity. Nur wenn die lokalen
+# Vorfilter die Zeile vollständig entscheiden, entfällt die Anfrage.
+def classify_entity_combined(entity, sentence, sentence_id, max_sentence_id, byline, rules=True, source=None,
+                             context=None):
+    check_author = sentence_id == 1 or sentence_id == max_sentence_id
+    answers, stages = local_answers(entity, sentence, check_author, byline, rules, source)
+    verdict = verdict_from_answers(answers, check_author, stages)
+    if verdict is not None:
+        return verdict
+    result = yield combined_request(entity, sentence, check_author, context)
+    if result is None:
+        return {}
+    return verdict_from_answers({**COMBINED_DEFAULTS, **normalize_answer(result), **answers}, check_author, stages)
+
+# Eine Anfrage für mehrere Entitäten eines Artikels. Die Sätze werden nur einmal mitgeschickt, und zwar der Abschnitt
+# vom ersten bis zum letzten Satz, in dem eine der Entitäten vorkommt. Die Namen werden mit 1 bis n nummeriert statt
+# mit ihrer entity_id, die das Modell sonst als lange Zahl wiederholen müsste; die Antworten werden lokal zugeordnet.
+# entities: Liste von (entity, sentence_id, check_author); sentences: dict sentence_id -> Satz
+def document_request(entities, sentences):
+    first = min(entity[1] for entity in entities)
+    last = max(entity[1] for entity in entities)
+    context = "\n".join(f"[{sentence_id}] {sentences[sentence_id]}"
+                        for sentence_id in range(first, last + 1) if sentence_id in sentences)
+    listing = "\n".join(
+        f"- nummer {number}: '{entity}' (Satz {sentence_id}"
+        + (", Autorenfrage beantworten)" if check_author else ")")
+        for number, (entity, sentence_id, check_author) in enumerate(entities, 1)
+    )
+    prompt = (
+        "Du erhältst Sätze aus einem Artikel (mit Satznummer) und eine Liste von Namen, die darin vorkommen. "
+        "Beantworte für jeden Namen die folgenden Fragen.\n\n"
+        f"Sätze:\n{context}\n\n"
+        f"Namen:\n{listing}\n\n"
+        f"1. {AUTHOR_QUESTION} (Nur für Namen, bei denen die Autorenfrage verlangt ist, sonst false.)\n\n"
+        f"2. {PERSON_QUESTION}\n\n"
+        f"3. {ROLE_QUESTION}\n\n"
+        "Gib für jede nummer genau ein Ergebnis zurück. Bitte gib das Ergebnis als Funktionsaufruf zurück."
+    )
+    tool_spec = {
+        "name": "classify_entities",
+        "description": "Beurteile jede genannte Person: Autor des Artikels, realer Personenname, aktive oder passive Rolle.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "entities": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"nummer": {"type": "integer"}, **COMBINED_PROPERTIES},
+                        "required": ["nummer", *COMBINED_PROPERTIES]
+                    }
+                }
+            },
+            "required": ["entities"]
+        }
+    }
+    return prompt, "classify_entities", tool_spec
+
+# Kaskade für alle Entitäten eines Artikels (group) mit möglichst wenigen Anfragen. Überschreitet die Anfrage
+# max_prompt_tokens, werden die Entitäten halbiert, bis jeder Teil passt. Entitäten, die in der Antwort fehlen (oder
+# deren Anfrage fehlschlägt), werden einzeln mit classify_entity nachgefragt. Liefert ein dict index -> Codierung.
+def classify_document(group, max_sentence_id, max_prompt_tokens=6000, rules=True):
+    sentences = SentenceIndex.from_group(group).sentences
+    verdicts = {}
+    entities = []
+    local = {}
+    for idx, row in group.iterrows():
+        check_author = row['sentence_id'] == 1 or row['sentence_id'] == max_sentence_id
+        local[idx] = local_answers(row['entity'], row['sentence'], check_author, row.get('article_byline'), rules,
+                                   row.get('article_source'))
+        verdict = verdict_from_answers(local[idx][0], check_author, local[idx][1])
+        if verdict is not None:
+            verdicts[idx] = verdict
+            continue
+        entities.append((idx, row['entity'], int(row['sentence_id']), check_author))
+
+    parts = [entities] if entities else []
+    missing = []
+    while parts:
+        part = parts.pop()
+        request = document_request([entity[1:] for entity in part], sentences)
+        if len(part) > 1 and estimate_tokens(request[0], request[2]) > max_prompt_tokens:
+            half = len(part) // 2
+            parts += [part[half:], part[:half]]
+            continue
+        result = yield request
+        answers = {answer.get("nummer"): answer for answer in (result or {}).get("entities", [])
+                   if isinstance(answer, dict)}
+        for number, (idx, entity, sentence_id, check_author) in enumerate(part, 1):
+            if number not in answers:
+                missing.append(idx)
                 continue
+            known, stages = local[idx]
+            verdicts[idx] = verdict_from_answers(
+                {**COMBINED_DEFAULTS, **normalize_answer(answers[number]), **known}, check_author, stages
+            )
+    for idx in missing:
+        row = group.loc[idx]
+        verdicts[idx] = yield from classify_entity(row['entity'], row['sentence'], row['sentence_id'], max_sentence_id,
+                                                   row.get('article_byline'), rules, row.get('article_source'))
+    return verdicts
+
+# Macht aus der Kaskade einer Zeile eine Kaskade, die wie classify_document ein dict index -> Codierung liefert
+def keyed_verdict(idx, steps):
+    verdict = yield from steps
+    return {idx: verdict}
+
+# Alle Kaskaden für df: pro Zeile mit cascade oder, mit per_document, eine Kaskade pro Artikel. Mit context_sentences
+# erhalten die Kaskaden pro Zeile bis zu so viele Sätze davor und danach als Kontext, höchstens context_tokens.
+def classification_jobs(df, cascade=classify_entity, per_document=False, max_prompt_tokens=6000, rules=True,
+                        context_sentences=0, context_tokens=300):
+    for doc_id, group in df.groupby("document_id"):
+        if per_document:
+            yield classify_document(group, group['sentence_id'].max(), max_prompt_tokens, rules)
+            continue
+        max_sentence_id = group['sentence_id'].max()
+        index = SentenceIndex.from_group(group, context_sentences, context_tokens) if context_sentences else None
+        for idx, row in zip(group.index, group.itertuples(index=False)):
+            yield keyed_verdict(idx, cascade(row.entity, row.sentence, row.sentence_id, max_sentence_id,
+                                             getattr(row, "article_byline", None), rules,
+                                             getattr(row, "article_source", None),
+                                             index.text(row.sentence_id) if index is not None else None))
+
+RESULT_SYMBOLS = {"is_author": "✍️ ", "is_person": "👤 ", "is_same_person": "🟰 ", "is_passive_actor": "💬 ",
+                  "classify_entity": "🧾 ", "classify_entities": "📰 "}
+
+# Führt die Kaskade seriell mit ask_openai_tool aus. Ist stats ein dict, werden dort Anzahl und Länge der Prompts gezählt.
+def run_classification(steps, stats=None):
+    try:
+        request = next(steps)
+        while True:
+            if stats is not None:
+                stats["requests"] = stats.get("requests", 0) + 1
+                stats["prompt_tokens"] = stats.get("prompt_tokens", 0) + estimate_tokens(request[0], request[2])
+            result = ask_openai_tool(*request)
+            print(f"{RESULT_SYMBOLS.get(request[1], '')} {result}")
+            request = steps.send(result)
+    except StopIteration as stop:
+        return stop.value
+
+# Führt die Kaskaden aus jobs im Gleichschritt aus, jeweils batch_size Kaskaden auf einmal: die offenen Anfragen aller
+# Kaskaden eines Blocks werden mit ask_many gestellt, so rechnen lokale Backends sie in einem Durchlauf. Liefert die
+# Ergebnisse der Kaskaden in der Reihenfolge von jobs.
+def run_batched(jobs, batch_size=32):
+    jobs = iter(jobs)
+    while True:
+        block = list(itertools.islice(jobs, batch_size))
+        if not block:
+            return
+        results = [None] * len(block)
+        pending = {}
+        for position, steps in enumerate(block):
+            try:
+                pending[position] = next(steps)
+            except StopIteration as stop:
+                results[position] = stop.value
+        while pending:
+            answers = ask_many(list(pending.values()))
+            for position, result in zip(list(pending), answers):
+                try:
+                    pending[position] = block[position].send(result)
+                except StopIteration as stop:
+                    results[position] = stop.value
+                    del pending[position]
+        yield from results
+
+CODING_COLUMNS = ["journalist", "relevant", "misclassification", "passive_actor"]
 
-            # Ist die Entität ein aktiver oder passiver Akteur?
-            if is_passive_actor(entity, sentence):
-                df.at[idx, 'passive_actor'] = True
-                df.at[idx, 'relevant'] = False
+# Varianten für agreement_report: jeweils (Name, Kaskade, Vorfilter an) für Referenz und Alternative
+COMPARISONS = {
+    "combined": (("separate", classify_entity, True), ("combined", classify_entity_combined, True)),
+    "rules": (("llm", classify_entity, False), ("rules", classify_entity, True)),
+}
+
+# Vergleicht zwei Varianten der Klassifikation (siehe COMPARISONS) auf einer Stichprobe von sample_size Zeilen, z. B.
+# drei Anfragen gegen die kombinierte Anfrage oder das Modell allein gegen die Vorfilter. Liefert pro Zeile beide
+# Codierungen und eine Zusammenfassung mit Übereinstimmung, Anfragen und geschätzten Tokens.
+def agreement_report(df, sample_size, comparison="combined", random_state=0):
+    max_sentence_ids = df.groupby("document_id")["sentence_id"].transform("max")
+    sample = df.sample(min(sample_size, len(df)), random_state=random_state).sort_index()
+    variants = COMPARISONS[comparison]
+    stats = {name: {} for name, _, _ in variants}
+    rows = []
+    for idx, row in sample.iterrows():
+        args = (row['entity'], row['sentence'], row['sentence_id'], max_sentence_ids[idx], row.get('article_byline'))
+        record = {"entity_id": row['entity_id'], "entity": row['entity']}
+        for name, cascade, rules in variants:
+            verdict = run_classification(cascade(*args, rules=rules, source=row.get('article_source')), stats[name])
+            for column in CODING_COLUMNS:
+                record[f"{column}_{name}"] = verdict.get(column, False)
+            record[f"decided_by_{name}"] = verdict.get("decided_by")
+        rows.append(record)
+    rows = pd.DataFrame(rows)
+    (first, _, _), (second, _, _) = variants
+    summary = pd.DataFrame({
+        "agreement": pd.Series({column: (rows[f"{column}_{first}"] == rows[f"{column}_{second}"]).mean()
+                                for column in CODING_COLUMNS}),
+        **{f"requests_{name}": stats[name].get("requests", 0) for name, _, _ in variants},
+        **{f"prompt_tokens_{name}": stats[name].get("prompt_tokens", 0) for name, _, _ in variants},
+    })
+    return rows, summary
+
+# Grobe Schätzung der Tokens einer Anfrage (ca. 4 Zeichen pro Token) für das Tokens-pro-Minute-Limit
+def estimate_tokens(prompt, tool_spec):
+    return (len(prompt) + len(json.dumps(tool_spec, ensure_ascii=False))) // 4 + 1
+
+# Token-Bucket: füllt sich kontinuierlich mit rate_per_minute auf, höchstens bis capacity
+class TokenBucket:
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+# Asynchrone Klassifikation vieler Zeilen gleichzeitig: höchstens max_in_flight offene Anfragen, Token-Buckets für
+# Anfragen und Tokens pro Minute und exponentielles Backoff bei 429, 5xx und Verbindungsfehlern.
+# Der Client ist ein openai.AsyncOpenAI, base_url kann auch auf einen lokalen Mock-Server zeigen.
+class AsyncClassificationEngine:
+
+    RETRY_ERRORS = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+
+    def __init__(self, client, max_in_flight=8, requests_per_minute=60, tokens_per_minute=100000, max_retries=5,
+                 base_delay=1.0, max_delay=60.0, cache=None, batch_size=32):
+        self.client = client
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.cache = cache
+        self.retries = 0
+        self.failures = 0
+        self.loop = None
+        self.batch_size = batch_size
+        self.waiting = defaultdict(list)
+        self.batches = {}
+
+    def backoff(self, attempt, error):
+        # Retry-After des Servers hat Vorrang, sonst exponentiell mit Jitter
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            return min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1)
+
+    async def ask(self, prompt, tool_name, tool_spec):
+        if tool_name in backends:
+            return await self.ask_backend(backends[tool_name], prompt, tool_name, tool_spec)
+        if self.cache is not None:
+            cached = self.cache.get(prompt, tool_name, tool_spec, MODEL, TEMPERATURE)
+            if cached is not None:
+                run_metrics.add_request(tool_name, 0.0, cached=True)
+                return cached
+        # Latenz nur der Anfrage selbst; Wartezeit auf Limits und freien Platz (queued) und Pausen zwischen
+        # Wiederholungen (backoff) werden getrennt gezählt
+        queued = backoff = 0.0
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            waiting = time.perf_counter()
+            try:
+                # Die Limits erst mit einem freien Platz nehmen, direkt vor dem Senden; sonst könnten Aufgaben mit
+                # bereits genommenen Tokens am Semaphor warten und danach dicht hintereinander senden
+                async with self.semaphore:
+                    await self.request_bucket.acquire()
+                    await self.token_bucket.acquire(estimate_tokens(prompt, tool_spec))
+                    start = time.perf_counter()
+                    queued += start - waiting
+                    response = await self.client.chat.completions.create(
+                        model=MODEL,
+                        messages=[{"role": "user", "content": prompt}],
+                        tools=[{"type": "function", "function": tool_spec}],
+                        tool_choice={"type": "function", "function": {"name": tool_name}},
+                        temperature=TEMPERATURE
+                    )
+                seconds = time.perf_counter() - start
+                arguments = json.loads(response.choices[0].message.tool_calls[0].function.arguments)
+            except self.RETRY_ERRORS as e:
+                if attempt == self.max_retries:
+                    break
+                self.retries += 1
+                delay = self.backoff(attempt, e)
+                backoff += delay
+                await asyncio.sleep(delay)
+                continue
+            except Exception as e:
+                print(f"❌ Fehler: {e}")
+                self.failures += 1
+                run_metrics.add_request(tool_name, time.perf_counter() - start, retries=attempt, failed=True,
+                                        queued=queued, backoff=backoff)
+                return None
+            run_metrics.add_request(tool_name, seconds, response_tokens(response, prompt, tool_spec), retries=attempt,
+                                    queued=queued, backoff=backoff)
+            if self.cache is not None:
+                self.cache.put(prompt, tool_name, tool_spec, MODEL, TEMPERATURE, arguments)
+            return arguments
+        print(f"❌ Fehler: {tool_name} nach {self.max_retries} Wiederholungen abgebrochen")
+        self.failures += 1
+        run_metrics.add_request(tool_name, time.perf_counter() - start, retries=self.max_retries, failed=True,
+                                queued=queued, backoff=backoff)
+        return None
+
+    # Fragen mit eigenem Backend (--backend): gleichzeitig anstehende Anfragen werden gesammelt und in Blöcken von
+    # batch_size in einem eigenen Thread beantwortet, damit die Anfragen an die übrigen Backends weiterlaufen
+    async def ask_backend(self, backend, prompt, tool_name, tool_spec):
+        cached = cached_answer(backend, prompt, tool_name, tool_spec)
+        if cached is not None:
+            return cached
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[backend].append(((prompt, tool_name, tool_spec), future))
+        if backend not in self.batches or self.batches[backend].done():
+            self.batches[backend] = asyncio.create_task(self.answer_waiting(backend))
+        return await future
+
+    async def answer_waiting(self, backend):
+        # Den übrigen Kaskaden Gelegenheit geben, ihre Anfragen einzureihen
+        await asyncio.sleep(0)
+        while self.waiting[backend]:
+            waiting = self.waiting[backend][:self.batch_size]
+            del self.waiting[backend][:self.batch_size]
+            requests = [request for request, _ in waiting]
+            answers = await asyncio.to_thread(backend.ask_batch, requests)
+            store_answers(backend, requests, answers)
+            for (_, future), (arguments, _, _) in zip(waiting, answers):
+                self.failures += arguments is None
+                future.set_result(arguments)
+
+    async def run(self, steps):
+        try:
+            request = next(steps)
+            while True:
+                request = steps.send(await self.ask(*request))
+        except StopIteration as stop:
+            return stop.value
+
+    # Führt classify_dataframe_async aus. Alle Aufrufe teilen eine Ereignisschleife, weil Semaphore, Token-Buckets und
+    # die Verbindungen des Clients an die Schleife gebunden sind, in der sie zuerst benutzt wurden.
+    def classify(self, df, jobs, results):
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(classify_dataframe_async(df, self, jobs, results))
+
+    def close(self):
+        if self.loop is not None:
+            self.loop.close()
+            self.loop = None
+
+# Führt die Kaskaden aus classification_jobs asynchron in Blöcken von batch_size Kaskaden aus und sammelt die
+# Codierungen in results (ResultBuffer)
+async def classify_dataframe_async(df, engine, jobs, results, batch_size=500):
+    jobs = iter(jobs)
+    done = 0
+    while True:
+        batch = [job for _, job in zip(range(batch_size), jobs)]
+        if not batch:
+            break
+        for verdicts in await asyncio.gather(*(engine.run(job) for job in batch)):
+            results.add_verdicts(df['entity_id'], verdicts)
+        done += len(batch)
+        print(f"{done} Kaskaden abgeschlossen ({engine.retries} Wiederholungen, {engine.failures} Fehler).")
+
+# Spalten der Codierung und ihr Typ; fehlende Werte bleiben leer (pd.NA)
+CODING_TYPES = {"journalist": "boolean", "relevant": "boolean", "misclassification": "boolean",
+                "passive_actor": "boolean", "decided_by": "string", "person_decided_by": "string"}
+RESOLUTION_TYPES = {"canonical_entity_id": "Int64", "duplicate": "boolean"}
+
+# Sammelt Codierungen spaltenweise in typisierten Arrays (Wahrheitswerte als int8 mit -1 für fehlend, Ganzzahlen als
+# int64 mit Maske), statt sie Zelle für Zelle in den DataFrame zu schreiben. merge fügt alle Spalten in einem Schritt
+# über entity_id an. Mit stream_file werden die Codierungen alle flush_every Zeilen als CSV (entity_id und Spalten)
+# angehängt, so dass auch ein abgebrochener Lauf eine verwendbare Datei hinterlässt.
+class ResultBuffer:
+
+    def __init__(self, columns, stream_file=None, flush_every=500):
+        self.columns = columns
+        self.entity_ids = array.array("q")
+        self.values = {column: array.array("b") if dtype == "boolean" else array.array("q") if dtype == "Int64" else []
+                       for column, dtype in columns.items()}
+        self.masks = {column: array.array("b") for column, dtype in columns.items() if dtype == "Int64"}
+        self.stream = open(stream_file, "w", encoding="UTF-8", newline="") if stream_file is not None else None
+        self.flush_every = flush_every
+        self.written = 0
+
+    def add(self, entity_id, verdict):
+        self.entity_ids.append(int(entity_id))
+        for column, values in self.values.items():
+            value = verdict.get(column)
+            missing = value is None or value is pd.NA or (isinstance(value, float) and np.isnan(value))
+            if self.columns[column] == "boolean":
+                values.append(-1 if missing else int(bool(value)))
+            elif self.columns[column] == "Int64":
+                values.append(0 if missing else int(value))
+                self.masks[column].append(missing)
+            else:
+                values.append(None if missing else value)
+        if self.stream is not None and len(self.entity_ids) - self.written >= self.flush_every:
+            self.flush()
+
+    # verdicts: dict index -> Codierung wie von classify_document; entity_ids: Spalte entity_id des DataFrames
+    def add_verdicts(self, entity_ids, verdicts):
+        for idx, verdict in verdicts.items():
+            self.add(entity_ids[idx], verdict)
+
+    # Codierungen ab Zeile start als DataFrame mit Index entity_id
+    def frame(self, start=0):
+        data = {}
+        for column, values in self.values.items():
+            dtype = self.columns[column]
+            if dtype == "boolean":
+                codes = np.array(values[start:], dtype=np.int8)
+                data[column] = pd.arrays.BooleanArray(codes == 1, codes == -1)
+            elif dtype == "Int64":
+                data[column] = pd.arrays.IntegerArray(np.array(values[start:], dtype=np.int64),
+                                                      np.array(self.masks[column][start:], dtype=bool))
             else:
-                df.at[idx, 'relevant'] = True
+                data[column] = pd.array(values[start:], dtype=dtype)
+        return pd.DataFrame(data, index=pd.Index(np.array(self.entity_ids[start:], dtype=np.int64), name="entity_id"))
+
+    def flush(self):
+        if self.stream is None or self.written == len(self.entity_ids):
+            return
+        self.frame(self.written).to_csv(self.stream, header=self.stream.tell() == 0)
+        self.stream.flush()
+        self.written = len(self.entity_ids)
+
+    # Fügt die Codierungen in einem Schritt an df an; bei mehrfach codierten Entitäten gilt die letzte Codierung
+    def merge(self, df):
+        results = self.frame()
+        results = results[~results.index.duplicated(keep="last")]
+        return df.drop(columns=[column for column in results.columns if column in df]).join(results, on="entity_id")
+
+    def close(self):
+        self.flush()
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+
+# Beinahe-Duplikate von Artikeln (siehe ner_scripts/ingestion/dedup.py): In den Parquet-Tabellen verweist
+# representative_id auf den Artikel, dessen NER-Ergebnis ein Duplikat übernommen hat. Nur die Zeilen der Repräsentanten
+# werden klassifiziert, die Duplikate erhalten danach die Codierung derselben Entität (gleicher Satz, gleiche Position
+# im Satz) ihres Repräsentanten.
+def split_duplicates(df):
+    if 'representative_id' not in df:
+        return df, df.iloc[0:0]
+    is_duplicate = df['document_id'] != df['representative_id']
+    return df[~is_duplicate].copy(), df[is_duplicate].copy()
+
+
+# coded: codierte Zeilen der Repräsentanten, standardmäßig df; im Streaming-Modus auch die früherer Blöcke
+def fan_out(df, duplicates, columns, coded=None):
+    if duplicates.empty:
+        return df
+    coded = df if coded is None else coded
+    representatives = coded[['document_id', 'sentence_id', *columns]].assign(
+        position=coded.groupby(['document_id', 'sentence_id']).cumcount()
+    ).rename(columns={'document_id': 'representative_id'})
+    duplicates = duplicates.assign(position=duplicates.groupby(['document_id', 'sentence_id']).cumcount())
+    duplicates = duplicates.drop(columns=[column for column in columns if column in duplicates])
+    coded = duplicates.reset_index().merge(
+        representatives, on=['representative_id', 'sentence_id', 'position'], how='left'
+    ).set_index('index').drop(columns='position')
+    coded.index.name = None
+    return pd.concat([df, coded]).sort_index()
+
+
+# Duplikatscheck innerhalb eines Artikels: Schreibweisen derselben Person ("Drosten", "Christian Drosten",
+# "Prof. Drosten") werden zu einem Cluster zusammengefasst, kanonisch ist die erste Nennung (niedrigste entity_id).
+# Kandidaten werden nach Nachname blockiert, das Modell wird nur gefragt, wenn eine Schreibweise zu mehreren Personen
+# desselben Nachnamens passt (z. B. "Müller" neben "Anna Müller" und "Jörg Müller").
+NAME_PARTICLES = {"da", "de", "del", "den", "der", "di", "du", "la", "le", "van", "von", "zu", "zur"}
+NAME_PUNCTUATION = ".,;:!?()[]" + QUOTATION_MARKS
+
+# Kleingeschriebene Namensteile ohne Titel und Anreden (Prof., Dr., Frau, ...)
+def name_tokens(entity):
+    tokens = [token.strip(NAME_PUNCTUATION).lower() for token in str(entity).split()]
+    return tuple(token for token in tokens if token and token not in ROLE_WORDS)
+
+# Vornamen einer Schreibweise (alle Namensteile außer Nachname und Namenszusätzen wie "von")
+def given_names(tokens):
+    return [token for token in tokens[:-1] if token not in NAME_PARTICLES]
+
+# Zwei Vornamen passen zueinander, wenn sie gleich sind, einer die Initiale des anderen ist ("c" und "christian")
+# oder einer Teil eines Doppelnamens ist ("hans" und "hans-peter")
+def given_name_matches(first, second):
+    short, long = sorted([first, second], key=len)
+    return short == long or (len(short) == 1 and long.startswith(short)) or short in long.split("-")
+
+def names_compatible(first, second):
+    return all(given_name_matches(a, b) for a, b in zip(given_names(first), given_names(second)))
+
+# Nachname als Schlüssel der Blöcke; ein Genitiv ("Drostens") zählt zum Nachnamen ohne s, wenn dieser im Artikel
+# ebenfalls vorkommt
+def surname_keys(variants):
+    keys = {tokens: tokens[-1] for tokens in variants}
+    surnames = set(keys.values())
+    return {tokens: key[:-1] if key.endswith("s") and key[:-1] in surnames else key for tokens, key in keys.items()}
+
+# Kaskade für den Duplikatscheck eines Artikels (group), nutzbar wie classify_document mit run_classification oder
+# AsyncClassificationEngine. Schreibweisen eines Nachnamens werden von der vollständigsten zur kürzesten einem Cluster
+# zugeordnet, dessen Schreibweisen alle zu ihr passen. Passt keiner, beginnt sie einen neuen Cluster, passt genau einer,
+# wird sie ohne Anfrage zugeordnet; nur bei mehreren passenden Clustern wird das Modell gefragt, jeweils einmal pro
+# Schreibweise und Kandidat. decisions merkt sich die Antworten über Artikel hinweg (z. B. für Artikel-Duplikate).
+# Mit index (SentenceIndex des Artikels) erhält das Modell die Sätze um beide Nennungen statt nur der beiden Sätze.
+# Liefert ein dict index -> {"canonical_entity_id": ..., "duplicate": ...}.
+def resolve_document(group, decisions=None, index=None):
+    decisions = {} if decisions is None else decisions
+    mentions = defaultdict(list)
+    sentence_ids = {}
+    for idx, entity_id, entity, sentence, sentence_id in zip(group.index, group['entity_id'], group['entity'],
+                                                             group['sentence'], group['sentence_id']):
+        tokens = name_tokens(entity)
+        if tokens:
+            mentions[tokens].append((int(entity_id), idx, entity, sentence))
+            sentence_ids[idx] = int(sentence_id)
+    blocks = defaultdict(list)
+    for tokens, key in surname_keys(mentions).items():
+        blocks[key].append(tokens)
+
+    verdicts = {}
+    for variants in blocks.values():
+        variants.sort(key=lambda tokens: (-len(given_names(tokens)), min(mentions[tokens])))
+        clusters = []
+        for tokens in variants:
+            candidates = [cluster for cluster in clusters
+                          if all(names_compatible(tokens, other) for other in cluster)]
+            if len(candidates) > 1:
+                _, idx, entity, sentence = min(mentions[tokens])
+                chosen = None
+                for cluster in candidates:
+                    _, other_idx, other_entity, other_sentence = min(m for other in cluster for m in mentions[other])
+                    key = (entity, sentence, other_entity, other_sentence)
+                    if key not in decisions:
+                        context = index.text(sentence_ids[idx], sentence_ids[other_idx]) if index is not None else None
+                        result = yield same_person_request(*key, context)
+                        if result is None:
+                            continue
+                        decisions[key] = bool(result.get("same_person", False))
+                    if decisions[key]:
+                        chosen = cluster
+                        break
+                candidates = [chosen] if chosen is not None else []
+            if candidates:
+                candidates[0].append(tokens)
+            else:
+                clusters.append([tokens])
+        for cluster in clusters:
+            members = [mention for tokens in cluster for mention in mentions[tokens]]
+            canonical = min(members)[0]
+            for entity_id, idx, _, _ in members:
+                verdicts[idx] = {"canonical_entity_id": canonical, "duplicate": entity_id != canonical}
+    return verdicts
+
+# Duplikatscheck für alle Artikel; Missklassifikationen (keine realen Personen) werden nicht berücksichtigt.
+# context_sentences und context_tokens wie in classification_jobs.
+def resolution_jobs(df, context_sentences=0, context_tokens=300):
+    decisions = {}
+    if 'misclassification' in df:
+        df = df[~df['misclassification'].fillna(False).astype(bool)]
+    for doc_id, group in df.groupby("document_id"):
+        index = SentenceIndex.from_group(group, context_sentences, context_tokens) if context_sentences else None
+        yield resolve_document(group, decisions, index)
+
+
+# Schlüssel einer Schreibweise im Akteursregister, z. B. "christian drosten" für "Prof. Christian Drosten"
+def name_key(entity):
+    return " ".join(name_tokens(entity))
+
+# Kontext einer Nennung im Akteursregister: die Quelle des Artikels (wird mit den Antworten gespeichert).
+def context_fingerprint(source):
+    return " ".join(str(source).lower().split()) if pd.notna(source) else ""
+
+# Ob die Spalte einer Codierung gesetzt ist und den Wert value hat; Werte aus dem DataFrame können auch NaN, pd.NA
+# oder numpy.bool_ sein
+def has_value(verdict, column, value=True):
+    current = verdict.get(column)
+    return current is not None and pd.notna(current) and bool(current) == value
+
+# Übersetzt die Codierung einer Zeile zurück in die Antworten auf die einzelnen Fragen (Format von normalize_answer).
+def answers_from_verdict(verdict):
+    answers = {}
+    if has_value(verdict, "journalist"):
+        return {"is_author": True}
+    if has_value(verdict, "journalist", False):
+        answers["is_author"] = False
+    if has_value(verdict, "misclassification"):
+        answers["is_person"] = False
+    elif has_value(verdict, "passive_actor"):
+        answers.update(is_person=True, role="passiv")
+    elif has_value(verdict, "relevant"):
+        answers.update(is_person=True, role="aktiv")
+    return answers
 
-            # Save entity as seen
-        #seen_entities[doc_id].append((entity, idx))
+# Persistentes Akteursregister über Läufe und Datensätze hinweg (SQLite). Pro Schreibweise (name_key) speichert es den
+# kanonischen Namen (die vollständigste Schreibweise, die der Duplikatscheck ihr zugeordnet hat) und die bisherigen
+# Antworten des Modells auf die Frage, ob es eine reale Person ist. Nur diese Antwort gilt für den Akteur als Ganzes;
+# sie wird übernommen, wenn sie oft genug und einheitlich genug gegeben wurde. Ob jemand Autor ist und welche Rolle er
+# spielt, hängt von der einzelnen Nennung ab und wird weiter von Byline, Regeln oder Modell beantwortet. Die Spalte
+# fingerprint (Quelle des Artikels) wird mitgeschrieben, aber nicht ausgewertet.
+class ActorRegistry:
 
-    output_csv_file = f"relevant_actors_from_{dataset_name[:-3]}csv"
-    df.to_csv(os.path.join(script_dir, "daten", output_csv_file), index=False, encoding="UTF-8")
-    print(f"Erstelle CSV-Datei {output_csv_file} mit codierten Akteuren.")
+    def __init__(self, filename, min_observations=3, min_agreement=0.9):
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS actors "
+            "(name_key TEXT PRIMARY KEY, canonical_name TEXT NOT NULL, name_length INTEGER NOT NULL, "
+            "mentions INTEGER NOT NULL, first_seen REAL NOT NULL, last_seen REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS history "
+            "(name_key TEXT NOT NULL, fingerprint TEXT NOT NULL, question TEXT NOT NULL, answer TEXT NOT NULL, "
+            "count INTEGER NOT NULL, PRIMARY KEY (name_key, fingerprint, question, answer))"
+        )
+        self.connection.commit()
+        self.min_observations = min_observations
+        self.min_agreement = min_agreement
+        self.known = {}
+        self.hits = 0
+
+    # Einheitliche Antwort aus den Zählungen {Antwort: Anzahl}, sonst None
+    def decide(self, counts):
+        total = sum(counts.values())
+        if total < self.min_observations:
+            return None
+        answer, count = max(counts.items(), key=lambda item: item[1])
+        return json.loads(answer) if count / total >= self.min_agreement else None
+
+    # Ob die Entität laut Register eine reale Person ist, None wenn unbekannt oder uneinheitlich; während eines Laufs
+    # ändert sich das Register nicht, daher wird jede Schreibweise nur einmal nachgeschlagen
+    def is_person(self, entity):
+        key = name_key(entity)
+        if not key:
+            return None
+        if key not in self.known:
+            counts = defaultdict(int)
+            for answer, count in self.connection.execute(
+                    "SELECT answer, count FROM history WHERE name_key = ? AND question = 'is_person'", (key,)):
+                counts[answer] += count
+            self.known[key] = self.decide(counts)
+        if self.known[key] is not None:
+            self.hits += 1
+        return self.known[key]
+
+    # Übernimmt die Antworten des Modells auf is_person aus den Codierungen eines Laufs. Zeilen, deren is_person aus
+    # Regeln oder dem Register selbst stammt, und Artikel-Duplikate zählen nicht, damit sich Antworten nicht selbst
+    # bestätigen.
+    def record(self, df):
+        if 'representative_id' in df:
+            df = df[df['document_id'] == df['representative_id']]
+        if 'person_decided_by' not in df:
+            return
+        df = df[df['person_decided_by'].fillna("") == "llm"]
+        history = defaultdict(int)
+        for entity, source, verdict in zip(df['entity'], df.get('article_source', pd.Series(index=df.index)),
+                                           df.to_dict("records")):
+            key = name_key(entity)
+            answer = answers_from_verdict(verdict).get("is_person")
+            if key and answer is not None:
+                history[key, context_fingerprint(source), "is_person", json.dumps(answer)] += 1
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO history VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (name_key, fingerprint, question, answer) DO UPDATE SET count = count + excluded.count",
+                [(*fields, count) for fields, count in history.items()]
+            )
+
+    # Trägt die Schreibweisen ein; kanonisch ist die vollständigste Schreibweise des Clusters aus dem Duplikatscheck
+    # (canonical_entity_id) bzw. die Schreibweise selbst. Eine längere Schreibweise ersetzt eine kürzere.
+    def register_names(self, df):
+        if 'representative_id' in df:
+            df = df[df['document_id'] == df['representative_id']]
+        df = df.assign(name_key=df['entity'].map(name_key), name_length=df['entity'].map(lambda e: len(name_tokens(e))))
+        df = df[df['name_key'] != ""]
+        cluster = df['canonical_entity_id'].fillna(df['entity_id']) if 'canonical_entity_id' in df else df['entity_id']
+        longest = df.sort_values(['name_length', 'entity_id'], ascending=[False, True]).groupby(
+            [df['document_id'], cluster])[['entity', 'name_length']].first()
+        canonical = longest.reindex(pd.MultiIndex.from_arrays([df['document_id'], cluster])).set_index(df.index)
+        now = time.time()
+        names = {}
+        for key, name, length in zip(df['name_key'], canonical['entity'], canonical['name_length']):
+            mentions = names[key][2] + 1 if key in names else 1
+            if key not in names or length > names[key][1]:
+                names[key] = (name, int(length), mentions)
+            else:
+                names[key] = (*names[key][:2], mentions)
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO actors VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (name_key) DO UPDATE SET mentions = mentions + excluded.mentions, "
+                "last_seen = excluded.last_seen, "
+                "canonical_name = CASE WHEN excluded.name_length > name_length "
+                "THEN excluded.canonical_name ELSE canonical_name END, "
+                "name_length = MAX(name_length, excluded.name_length)",
+                [(key, name, length, mentions, now, now) for key, (name, length, mentions) in names.items()]
+            )
+
+    # Kanonische Namen für die Spalte entity (pandas.Series)
+    def canonical_names(self, entities):
+        keys = entities.map(name_key)
+        unique = list(keys.unique())
+        names = {}
+        for start in range(0, len(unique), 500):
+            chunk = list(unique[start:start + 500])
+            names.update(self.connection.execute(
+                f"SELECT name_key, canonical_name FROM actors WHERE name_key IN ({', '.join('?' * len(chunk))})", chunk
+            ).fetchall())
+        return keys.map(names)
+
+    def close(self):
+        self.connection.close()
+
+actor_registry = None
+
+
+# Pfad der Artikel- oder Satztabelle, die neben der Akteurstabelle liegt
+def parquet_table_file(actors_file, name):
+    directory, actors_name = os.path.split(actors_file)
+    return os.path.join(directory, actors_name.replace("actors_from_", f"{name}_from_", 1))
+
+
+# Metadaten der Artikeltabelle und ihr Name im Akteursdatensatz
+ARTICLE_COLUMNS = {column: f"article_{column}" for column in ["title", "source", "pubdate", "section", "byline"]}
+
+# Liest den Akteursdatensatz: die CSV-Datei wie bisher oder die Parquet-Tabellen der NER-Skripte
+# (actors_from_*.parquet, daneben articles_from_* und sentences_from_*). Artikelmetadaten und Satz werden wie in der
+# CSV-Datei an jede Zeile gehängt; sentences_joined wird nur einmal pro Artikel zusammengesetzt und von allen Zeilen
+# des Artikels geteilt.
+def load_actors(file_path):
+    if not file_path.endswith(".parquet"):
+        return pd.read_csv(file_path)
+    articles, sentences = (pd.read_parquet(parquet_table_file(file_path, name)) for name in ["articles", "sentences"])
+    articles = articles.rename(columns=ARTICLE_COLUMNS)
+    df = pd.read_parquet(file_path).merge(articles, on="document_id", how="left")
+    df = df.merge(sentences, on=["document_id", "sentence_id"], how="left")
+    df["sentences_joined"] = df["document_id"].map(sentences.groupby("document_id", sort=False)["sentence"].agg("<->".join))
+    return df
+
+
+# Spalten, die die Klassifikation braucht; im Streaming-Modus sieht sie nur diese Spalten eines Blocks
+# (sentences_joined nur mit --per-document oder --context-sentences)
+STREAMING_COLUMNS = ["entity_id", "entity", "document_id", "sentence_id", "sentence", "article_byline",
+                     "article_source", "representative_id"]
+
+# Fasst Blöcke von Zeilen zu Blöcken vollständiger Artikel zusammen: die Zeilen des letzten Artikels eines Blocks
+# werden in den nächsten übernommen. Der Datensatz muss nach document_id sortiert sein, wie ihn die NER-Skripte
+# schreiben, sonst wären die Artikel über mehrere Blöcke verteilt.
+def document_chunks(chunks):
+    rest = None
+    previous = None
+    for chunk in chunks:
+        if not chunk['document_id'].is_monotonic_increasing or (
+                previous is not None and len(chunk) and chunk['document_id'].iloc[0] < previous):
+            raise ValueError("Für --chunk-rows muss der Akteursdatensatz nach document_id sortiert sein.")
+        if len(chunk):
+            previous = chunk['document_id'].iloc[-1]
+        if rest is not None:
+            chunk = pd.concat([rest, chunk], ignore_index=True)
+        complete = chunk['document_id'] != previous
+        rest = chunk[~complete]
+        if complete.any():
+            yield chunk[complete]
+    if rest is not None and len(rest):
+        yield rest
+
+# Liest den Akteursdatensatz in Blöcken von etwa chunk_rows Zeilen, die nur vollständige Artikel enthalten, mit
+# denselben Spalten wie load_actors. Bei Parquet werden die Artikelmetadaten einmal und die Sätze nur für die Artikel
+# des jeweiligen Blocks gelesen.
+def iter_actors(file_path, chunk_rows):
+    if not file_path.endswith(".parquet"):
+        yield from document_chunks(pd.read_csv(file_path, chunksize=chunk_rows))
+        return
+    import pyarrow.parquet as pq
+
+    articles_file, sentences_file = (parquet_table_file(file_path, name) for name in ["articles", "sentences"])
+    articles = pd.read_parquet(articles_file).rename(columns=ARTICLE_COLUMNS)
+    batches = (batch.to_pandas() for batch in pq.ParquetFile(file_path).iter_batches(chunk_rows))
+    for chunk in document_chunks(batches):
+        sentences = pd.read_parquet(sentences_file, filters=[("document_id", ">=", int(chunk['document_id'].iloc[0])),
+                                                             ("document_id", "<=", int(chunk['document_id'].iloc[-1]))])
+        chunk = chunk.merge(articles, on="document_id", how="left")
+        chunk = chunk.merge(sentences, on=["document_id", "sentence_id"], how="left")
+        chunk["sentences_joined"] = chunk["document_id"].map(
+            sentences.groupby("document_id", sort=False)["sentence"].agg("<->".join))
+        yield chunk
+
+# Artikel, die Repräsentant mindestens eines Artikel-Duplikats sind. Ihre Codierungen werden im Streaming-Modus für
+# die Duplikate in späteren Blöcken aufbewahrt.
+def representatives_with_duplicates(file_path):
+    if file_path.endswith(".parquet"):
+        articles_file = parquet_table_file(file_path, "articles")
+        import pyarrow.parquet as pq
+        if "representative_id" not in pq.read_schema(articles_file).names:
+            return set()
+        ids = pd.read_parquet(articles_file, columns=["document_id", "representative_id"])
+    else:
+        if "representative_id" not in pd.read_csv(file_path, nrows=0).columns:
+            return set()
+        ids = pd.read_csv(file_path, usecols=["document_id", "representative_id"])
+    return set(ids.loc[ids['document_id'] != ids['representative_id'], 'representative_id'])
+
+# Fortschritt des Streaming-Modus: nach jedem vollständig angehängten Block wird die Länge der Ausgabedatei in
+# <Ausgabedatei>.progress festgehalten (über eine temporäre Datei und os.replace, damit die Angabe nie halb geschrieben
+# ist). Beim Fortsetzen wird die Ausgabedatei auf diese Länge gekürzt: Zeilen eines beim Anhängen abgebrochenen Blocks
+# verschwinden, und seine Artikel werden erneut codiert.
+def save_progress(output_path):
+    progress_path = f"{output_path}.progress"
+    with open(f"{progress_path}.tmp", "w", encoding="UTF-8") as file:
+        file.write(str(os.path.getsize(output_path)))
+    os.replace(f"{progress_path}.tmp", progress_path)
+
+# Kürzt die Ausgabedatei auf den zuletzt vollständig geschriebenen Block; False, wenn kein Fortschritt festgehalten ist
+def restore_progress(output_path):
+    progress_path = f"{output_path}.progress"
+    if not os.path.exists(progress_path):
+        return False
+    with open(progress_path, encoding="UTF-8") as file:
+        size = int(file.read())
+    if os.path.getsize(output_path) > size:
+        os.truncate(output_path, size)
+    return True
+
+# Misst die Zeit, die das Lesen jedes Blocks braucht
+def timed_chunks(chunks, stage="load"):
+    chunks = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        run_metrics.add_stage(stage, time.perf_counter() - start, documents=chunk['document_id'].nunique())
+        yield chunk
+
+# Codiert alle Zeilen von df (vollständige Artikel) mit den Optionen von args: Klassifikation seriell, pro Artikel
+# oder asynchron mit engine, Übernahme der Codierung für Artikel-Duplikate, Duplikatscheck und Akteursregister.
+# coded: bereits codierte Zeilen von Repräsentanten aus früheren Blöcken. Liefert df mit den Codierungen.
+def code_actors(df, args, engine=None, stream_file=None, coded=None):
+    df, duplicates = split_duplicates(df)
+    if not duplicates.empty:
+        print(f"{len(duplicates)} Zeilen aus Artikel-Duplikaten übernehmen die Codierung ihres Repräsentanten.")
+    cascade = classify_entity_combined if args.combined else classify_entity
+    rules = not args.no_rules
+
+    results = ResultBuffer(CODING_TYPES, stream_file)
+    classify_start = time.perf_counter()
+    if engine is not None:
+        engine.classify(df, classification_jobs(df, cascade, args.per_document, args.max_prompt_tokens, rules,
+                                                args.context_sentences, args.context_tokens), results)
+    elif args.batch_size > 1:
+        jobs = classification_jobs(df, cascade, args.per_document, args.max_prompt_tokens, rules, args.context_sentences,
+                                   args.context_tokens)
+        for verdicts in run_batched(jobs, args.batch_size):
+            results.add_verdicts(df['entity_id'], verdicts)
+    elif args.per_document:
+        for verdicts in map(run_classification, classification_jobs(df, per_document=True, rules=rules,
+                                                                     max_prompt_tokens=args.max_prompt_tokens)):
+            results.add_verdicts(df['entity_id'], verdicts)
+    else:
+        grouped = df.groupby("document_id")
+        for doc_id, group in grouped:
+
+            # if doc_id < 5: # not in ["1"]:
+              #  continue
+
+            print("##############################")
+            print(doc_id)
+
+            max_sentence_id = group['sentence_id'].max()
+            # Vorherige und nächste Sätze aus sentences_joined, einmal pro Artikel indiziert
+            index = SentenceIndex.from_group(group, args.context_sentences, args.context_tokens) \
+                if args.context_sentences else None
+
+            for row in group.itertuples(index=False):
+                entity = row.entity
+                sentence = row.sentence
+                sentence_id = row.sentence_id
+
+                print("\n###")
+                print(entity)
+                print(sentence)
+
+                verdict = run_classification(
+                    cascade(entity, sentence, sentence_id, max_sentence_id, getattr(row, 'article_byline', None), rules,
+                            getattr(row, 'article_source', None),
+                            index.text(sentence_id) if index is not None else None)
+                )
+                results.add(row.entity_id, verdict)
+    results.close()
+    run_metrics.add_stage("classify", time.perf_counter() - classify_start, documents=df['document_id'].nunique(),
+                          entities=len(df))
+
+    df = results.merge(df)
+    df = fan_out(df, duplicates, list(CODING_TYPES), df if coded is None else pd.concat([coded, df[coded.columns]]))
+    if not args.no_duplicate_check:
+        print("Duplikatscheck: Schreibweisen derselben Person pro Artikel zusammenfassen.")
+        resolve_start = time.perf_counter()
+        resolution = ResultBuffer(RESOLUTION_TYPES)
+        if engine is not None:
+            engine.classify(df, resolution_jobs(df, args.context_sentences, args.context_tokens), resolution)
+        elif args.batch_size > 1:
+            for verdicts in run_batched(resolution_jobs(df, args.context_sentences, args.context_tokens), args.batch_size):
+                resolution.add_verdicts(df['entity_id'], verdicts)
+        else:
+            for verdicts in map(run_classification, resolution_jobs(df, args.context_sentences, args.context_tokens)):
+                resolution.add_verdicts(df['entity_id'], verdicts)
+        df = resolution.merge(df)
+        print(f"{int(df['duplicate'].sum())} Nennungen als Duplikat einer früheren Nennung erkannt.")
+        run_metrics.add_stage("resolve", time.perf_counter() - resolve_start, documents=df['document_id'].nunique(),
+                              entities=len(df))
+    if actor_registry is not None:
+        actor_registry.record(df)
+        actor_registry.register_names(df)
+        df['canonical_name'] = actor_registry.canonical_names(df['entity'])
+    return df
+
+# Codiert einen Block des Streaming-Modus: die Klassifikation sieht nur die Spalten aus STREAMING_COLUMNS, die
+# Codierungen werden danach über entity_id an alle Spalten des Blocks gehängt, so dass die Ausgabe dieselben Spalten
+# hat wie ohne --chunk-rows
+def code_chunk(chunk, args, engine=None, coded=None):
+    columns = STREAMING_COLUMNS + (["sentences_joined"] if args.per_document or args.context_sentences > 0 else [])
+    narrow = code_actors(chunk[[column for column in columns if column in chunk]], args, engine, coded=coded)
+    added = [column for column in narrow.columns if column not in columns]
+    return chunk.drop(columns=[column for column in added if column in chunk]).merge(
+        narrow[['entity_id', *added]], on='entity_id', how='left')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Identifiziere relevante Akteure im Akteursdatensatz.")
+    parser.add_argument("--cache", default=os.path.join("daten", "llm_cache.sqlite"),
+                        help="SQLite-Datei mit den zwischengespeicherten Antworten des Modells (relativ zum Skript)")
+    parser.add_argument("--no-cache", action="store_true", help="jede Anfrage an das Modell senden")
+    parser.add_argument("--cache-max-age-days", type=float, default=None,
+                        help="ältere Antworten im Cache werden neu abgefragt")
+    parser.add_argument("--invalidate-model", default=None,
+                        help="alle zwischengespeicherten Antworten dieses Modells vor dem Lauf löschen")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="Anzahl gleichzeitiger Anfragen; 0 klassifiziert seriell wie bisher")
+    parser.add_argument("--requests-per-minute", type=float, default=60, help="Limit der Anfragen pro Minute")
+    parser.add_argument("--tokens-per-minute", type=float, default=100000, help="Limit der Tokens pro Minute")
+    parser.add_argument("--base-url", default=None,
+                        help="abweichender Endpunkt, z. B. ein lokaler Mock-Server zum Testen")
+    parser.add_argument("--combined", action="store_true",
+                        help="alle drei Fragen pro Entität in einer einzigen Anfrage stellen")
+    parser.add_argument("--per-document", action="store_true",
+                        help="alle Entitäten eines Artikels gemeinsam in möglichst wenigen Anfragen klassifizieren")
+    parser.add_argument("--max-prompt-tokens", type=int, default=6000,
+                        help="größere Anfragen im Modus --per-document werden aufgeteilt")
+    parser.add_argument("--backend", action="append", default=[], metavar="FRAGE=BACKEND",
+                        help="eigenes Backend für eine Frage (is_author, is_person, is_passive_actor, is_same_person, "
+                             "classify_entity, classify_entities): openai:MODELL@URL für einen kompatiblen Server, "
+                             "z. B. ein lokales quantisiertes Modell, oder transformers:MODELL für einen lokalen "
+                             "Klassifikator; mehrfach angeben")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="so viele Kaskaden im Gleichschritt ausführen und ihre Anfragen gesammelt stellen "
+                             "(Blockgröße lokaler Backends); 1 klassifiziert einzeln wie bisher")
+    parser.add_argument("--compare", type=int, default=0, metavar="N",
+                        help="nur N zufällige Zeilen mit beiden Varianten klassifizieren und die Übereinstimmung ausgeben")
+    parser.add_argument("--compare-mode", choices=sorted(COMPARISONS), default="combined",
+                        help="verglichene Varianten: drei Anfragen gegen kombinierte Anfrage oder Modell gegen Vorfilter")
+    parser.add_argument("--context-sentences", type=int, default=0, metavar="K",
+                        help="bis zu K Sätze vor und nach dem Satz der Entität als Kontext für die Frage nach der "
+                             "Rolle (auch mit --combined) und nach derselben Person mitschicken; 0 schickt nur den "
+                             "Satz wie bisher")
+    parser.add_argument("--context-tokens", type=int, default=300,
+                        help="geschätzte Tokens, die der Kontext aus --context-sentences höchstens umfasst")
+    parser.add_argument("--no-rules", action="store_true",
+                        help="lokale Vorfilter abschalten (nur die Byline wird weiterhin lokal geprüft)")
+    parser.add_argument("--no-duplicate-check", action="store_true",
+                        help="Schreibweisen derselben Person innerhalb eines Artikels nicht zusammenfassen")
+    parser.add_argument("--registry", action="store_true",
+                        help="Akteursregister nutzen und fortschreiben: übernimmt einheitliche Antworten des Modells, "
+                             "ob eine Schreibweise eine reale Person ist, aus früheren Läufen")
+    parser.add_argument("--registry-file", default=os.path.join("daten", "actor_registry.sqlite"),
+                        help="SQLite-Datei des Akteursregisters über alle Datensätze (relativ zum Skript)")
+    parser.add_argument("--registry-min-observations", type=int, default=3,
+                        help="so oft muss eine Antwort im Register vorliegen, bevor sie übernommen wird")
+    parser.add_argument("--registry-min-agreement", type=float, default=0.9,
+                        help="Anteil, den die häufigste Antwort im Register mindestens haben muss")
+    parser.add_argument("--metrics", default=None,
+                        help="JSON-Lines-Datei für die Metriken des Laufs (relativ zum Skript); Standard ist "
+                             "daten/metrics_relevant_actors_from_<Datensatz>.jsonl")
+    parser.add_argument("--chunk-rows", type=int, default=0, metavar="N",
+                        help="den Datensatz in Blöcken von etwa N Zeilen (nur vollständige Artikel) lesen, codieren "
+                             "und an die Ausgabedatei anhängen; 0 lädt alles auf einmal wie bisher")
+    parser.add_argument("--resume", action="store_true",
+                        help="mit --chunk-rows: Artikel überspringen, die in einem vollständig geschriebenen Block der "
+                             "Ausgabedatei stehen")
+    args = parser.parse_args()
+    if args.resume and args.chunk_rows <= 0:
+        parser.error("--resume setzt --chunk-rows voraus")
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    if args.base_url is not None:
+        client = openai.OpenAI(api_key=client.api_key, base_url=args.base_url)
+        default_backend = OpenAIBackend(client, MODEL, delay=1.0)
+    created_backends = {}
+    for backend_spec in args.backend:
+        question, _, spec = backend_spec.partition("=")
+        if question not in LOCAL_QUESTIONS + ["classify_entity", "classify_entities"] or not spec:
+            parser.error(f"--backend {backend_spec}: erwartet FRAGE=BACKEND, Fragen: "
+                         f"{', '.join(LOCAL_QUESTIONS)}, classify_entity, classify_entities")
+        if spec.startswith("transformers:") and question not in LOCAL_QUESTIONS:
+            parser.error(f"--backend {backend_spec}: lokale Klassifikatoren nur für {', '.join(LOCAL_QUESTIONS)}")
+        # Fragen mit demselben Backend teilen sich ein Modell (und dessen Blöcke)
+        if spec not in created_backends:
+            try:
+                created_backends[spec] = make_backend(spec, args.batch_size)
+            except ValueError as e:
+                parser.error(str(e))
+        backends[question] = created_backends[spec]
+    if not args.no_cache:
+        response_cache = ResponseCache(os.path.join(script_dir, args.cache), args.cache_max_age_days)
+        if args.invalidate_model is not None:
+            print(f"{response_cache.invalidate(args.invalidate_model)} Antworten von {args.invalidate_model} gelöscht.")
+    if args.registry:
+        actor_registry = ActorRegistry(os.path.join(script_dir, args.registry_file), args.registry_min_observations,
+                                       args.registry_min_agreement)
+    dataset_name = input('Name of the file with the actors?')
+    file_path = os.path.join(script_dir, "daten", dataset_name)
+    dataset_stem = os.path.splitext(dataset_name)[0]
+    metrics_file = args.metrics or os.path.join("daten", f"metrics_relevant_actors_from_{dataset_stem}.jsonl")
+    run_metrics = Metrics(os.path.join(script_dir, metrics_file), script="identify_relevant_actors", dataset=dataset_name,
+                          model=MODEL, mode="compare" if args.compare else "per_document" if args.per_document
+                          else "combined" if args.combined else "separate", concurrency=args.concurrency,
+                          backends={question: backend.model for question, backend in backends.items()})
+
+    load_lexicons(os.path.join(script_dir, "daten", "lexika"))
+    engine = None
+    if args.concurrency > 0 and args.compare == 0:
+        engine = AsyncClassificationEngine(
+            openai.AsyncOpenAI(api_key=client.api_key, base_url=client.base_url, max_retries=0),
+            max_in_flight=args.concurrency,
+            requests_per_minute=args.requests_per_minute,
+            tokens_per_minute=args.tokens_per_minute,
+            cache=response_cache,
+            batch_size=max(args.batch_size, 1)
+        )
+    output_csv_file = f"relevant_actors_from_{dataset_stem}.csv"
+    output_path = os.path.join(script_dir, "daten", output_csv_file)
+
+    if args.compare > 0:
+        with run_metrics.stage("load") as counts:
+            df = load_actors(file_path)
+            counts["documents"] = df['document_id'].nunique()
+        df, duplicates = split_duplicates(df)
+        with run_metrics.stage("classify", documents=df['document_id'].nunique(), entities=min(len(df), args.compare)):
+            comparison, summary = agreement_report(df, args.compare, args.compare_mode)
+        comparison_csv_file = f"agreement_report_from_{dataset_stem}.csv"
+        comparison.to_csv(os.path.join(script_dir, "daten", comparison_csv_file), index=False, encoding="UTF-8")
+        print(summary)
+        print(f"Erstelle CSV-Datei {comparison_csv_file} mit beiden Codierungen.")
+    elif args.chunk_rows > 0:
+        # Streaming: Blöcke vollständiger Artikel lesen, codieren und an die Ausgabedatei anhängen. Die Codierungen
+        # der Repräsentanten von Artikel-Duplikaten werden für Duplikate in späteren Blöcken aufbewahrt.
+        clustered = representatives_with_duplicates(file_path)
+        coded = None
+        done = set()
+        header = None
+        resume = args.resume and os.path.exists(output_path) and restore_progress(output_path)
+        if args.resume and not resume:
+            print(f"Fortsetzen: kein vollständig geschriebener Block in {output_csv_file}, beginne von vorn.")
+        if resume:
+            header = list(pd.read_csv(output_path, nrows=0).columns)
+            done = set(pd.read_csv(output_path, usecols=["document_id"])['document_id'])
+            coded = pd.read_csv(output_path, usecols=['document_id', 'sentence_id', *CODING_TYPES])
+            coded = coded[coded['document_id'].isin(clustered)].astype(CODING_TYPES)
+            print(f"Fortsetzen: {len(done)} Artikel sind bereits in {output_csv_file} codiert.")
+        else:
+            for path in (output_path, f"{output_path}.progress"):
+                if os.path.exists(path):
+                    os.remove(path)
+        decided_by = []
+        for chunk in timed_chunks(iter_actors(file_path, args.chunk_rows)):
+            chunk = chunk[~chunk['document_id'].isin(done)]
+            if chunk.empty:
+                continue
+            chunk = code_chunk(chunk, args, engine, coded)
+            representatives = chunk.loc[chunk['document_id'].isin(clustered), ['document_id', 'sentence_id', *CODING_TYPES]]
+            coded = representatives if coded is None else pd.concat([coded, representatives], ignore_index=True)
+            with run_metrics.stage("write", entities=len(chunk)):
+                if header is None:
+                    header = list(chunk.columns)
+                    chunk.to_csv(output_path, index=False, encoding="UTF-8")
+                else:
+                    chunk.reindex(columns=header).to_csv(output_path, mode="a", header=False, index=False,
+                                                         encoding="UTF-8")
+                save_progress(output_path)
+            decided_by.append(chunk['decided_by'])
+            print(f"{chunk['document_id'].nunique()} Artikel mit {len(chunk)} Akteuren an {output_csv_file} angehängt.")
+        if decided_by:
+            print("Entschieden durch:")
+            print(pd.concat(decided_by).value_counts(dropna=False))
+    else:
+        with run_metrics.stage("load") as counts:
+            df = load_actors(file_path)
+            counts["documents"] = df['document_id'].nunique()
+        pd.set_option('display.max_columns', None)
+        print(df)
+        partial_csv_file = os.path.join(script_dir, "daten", f"relevant_actors_from_{dataset_stem}.partial.csv")
+        df = code_actors(df, args, engine, partial_csv_file)
+        with run_metrics.stage("write", entities=len(df)):
+            df.to_csv(output_path, index=False, encoding="UTF-8")
+        print(f"Erstelle CSV-Datei {output_csv_file} mit codierten Akteuren.")
+        os.remove(partial_csv_file)
+        if 'decided_by' in df:
+            print("Entschieden durch:")
+            print(df['decided_by'].value_counts(dropna=False))
+    if actor_registry is not None:
+        print(f"Akteursregister: {actor_registry.hits} Nennungen mit bekannten Antworten.")
+        run_metrics.increment("registry_hits", actor_registry.hits)
+        actor_registry.close()
+    if response_cache is not None:
+        print(f"Cache: {response_cache.hits} Treffer, {response_cache.misses} Anfragen an das Modell.")
+        response_cache.close()
+    if engine is not None:
+        run_metrics.increment("retries", engine.retries)
+        run_metrics.increment("failures", engine.failures)
+        engine.close()
+    print(run_metrics.summary_table())
+    run_metrics.close()
+    print(f"Metriken in {metrics_file} geschrieben.")
@@ -0,0 +1,119 @@
+import argparse
+import http.server
+import json
+import random
+import re
+import time
+
+# OpenAI-kompatibler Ersatz-Server für Tests von identify_relevant_actors_ki_toolbox_no_api.py ohne Kosten und Quota.
+# Beantwortet POST /v1/chat/completions mit einem Funktionsaufruf des verlangten Tools. Die Antwort wird aus dem
+# Tool-Schema gebildet: Ja/Nein-Felder sind false, Auswahlfelder haben ihren ersten Wert; mit --answer lassen sich
+# einzelne Felder festlegen. Listen von Entitäten (classify_entities) enthalten einen Eintrag pro Nummer im Prompt.
+# Beispiel:
+#   python mock_openai_server.py --port 8765 --answer role=passiv
+#   python identify_relevant_actors_ki_toolbox_no_api.py --base-url http://127.0.0.1:8765/v1
+# oder nur für eine Frage:
+#   python identify_relevant_actors_ki_toolbox_no_api.py --backend is_person=openai:mock@http://127.0.0.1:8765/v1
+
+
+# Wert für ein Feld des Schemas; answers: festgelegte Werte pro Feldname
+def value_for(name, schema, answers, prompt):
+    if name in answers:
+        return answers[name]
+    if "enum" in schema:
+        return schema["enum"][0]
+    if schema.get("type") == "boolean":
+        return False
+    if schema.get("type") == "array":
+        items = schema.get("items", {})
+        # Listen von Namen (classify_entities): ein Eintrag pro Nummer im Prompt
+        keys = [key for key, field in items.get("properties", {}).items() if field.get("type") == "integer"]
+        if keys:
+            return [{keys[0]: int(number), **arguments_for(items, answers, prompt, skip=keys[:1])}
+                    for number in re.findall(rf"{keys[0]} (\d+)", prompt)]
+        return []
+    if schema.get("type") in ("integer", "number"):
+        return 0
+    if schema.get("type") == "object":
+        return arguments_for(schema, answers, prompt)
+    return ""
+
+def arguments_for(schema, answers, prompt, skip=()):
+    return {name: value_for(name, field, answers, prompt)
+            for name, field in schema.get("properties", {}).items() if name not in skip}
+
+
+class MockHandler(http.server.BaseHTTPRequestHandler):
+
+    answers = {}
+    latency = 0.0
+    error_rate = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=()):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for header in headers:
+            self.send_header(*header)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if not self.path.endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": f"Unbekannter Pfad {self.path}"}})
+            return
+        time.sleep(self.latency)
+        # Simuliertes Rate-Limit, um Wiederholungen und Retry-After zu testen
+        if random.random() < self.error_rate:
+            self.send_json(429, {"error": {"message": "Rate limit", "type": "rate_limit"}}, [("Retry-After", "0.1")])
+            return
+        prompt = " ".join(message.get("content") or "" for message in request["messages"])
+        tool_name = request["tool_choice"]["function"]["name"]
+        tool = next(tool["function"] for tool in request["tools"] if tool["function"]["name"] == tool_name)
+        arguments = json.dumps(arguments_for(tool["parameters"], self.answers, prompt), ensure_ascii=False)
+        prompt_tokens = len(prompt) // 4 + 1
+        completion_tokens = len(arguments) // 4 + 1
+        self.send_json(200, {
+            "id": f"chatcmpl-mock-{random.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "tool_calls",
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [{"id": "call_mock", "type": "function",
+                                    "function": {"name": tool_name, "arguments": arguments}}]
+                }
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}
+        })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-kompatibler Ersatz-Server für Tests der Akteurs-Klassifikation.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--answer", action="append", default=[], metavar="FELD=WERT",
+                        help="feste Antwort für ein Feld, z. B. role=passiv oder is_author=true; mehrfach angeben")
+    parser.add_argument("--latency", type=float, default=0.0, help="Wartezeit in Sekunden vor jeder Antwort")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Anteil der Anfragen, die mit 429 (Rate-Limit) beantwortet werden")
+    args = parser.parse_args()
+
+    for answer in args.answer:
+        name, _, value = answer.partition("=")
+        MockHandler.answers[name] = {"true": True, "false": False}.get(value.lower(), value)
+    MockHandler.latency = args.latency
+    MockHandler.error_rate = args.error_rate
+    server = http.server.ThreadingHTTPServer((args.host, args.port), MockHandler)
+    print(f"Mock-Server auf http://{args.host}:{args.port}/v1")
+    server.serve_forever()
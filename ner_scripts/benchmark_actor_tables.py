@@ -0,0 +1,128 @@
+import argparse
+import random
+import time
+import tracemalloc
+
+import pandas as pd
+
+from ingestion.actors import actor_columns, make_entity_id
+from ingestion.tables import actors_view, build_tables
+
+WORDS = ["Forschung", "Wissenschaft", "Gentechnik", "Regierung", "sagte", "Professorin", "Studie", "Universität",
+         "Klimawandel", "Ergebnisse", "die", "der", "und", "nicht", "Künstliche", "Intelligenz"]
+NAMES = ["Angela Merkel", "Hans Meier", "Christian Drosten", "Anna Schmidt", "Karl Lauterbach", "Jörg Müller"]
+
+
+def synthetic_corpus(documents, seed=0):
+    """
+    Build tagged articles in the format of Sentence.to_dict(tag_type='ner').
+    :param documents: number of articles (Int)
+    :param seed: seed of the random generator (Int)
+    :return: Pandas DataFrame with the metadata columns and a column flair_document
+    """
+    generator = random.Random(seed)
+    rows = []
+    for number in range(documents):
+        tagged_document = []
+        for _ in range(generator.randint(5, 40)):
+            entities = [{"text": generator.choice(NAMES), "start_pos": 0, "end_pos": 10,
+                         "labels": [{"value": generator.choice(["PER", "PER", "PER", "ORG", "LOC"]),
+                                     "confidence": 0.99}]}
+                        for _ in range(generator.choice([0, 0, 1, 1, 2, 3]))]
+            tagged_document.append({"text": " ".join(generator.choice(WORDS) for _ in range(20)), "labels": [],
+                                    "entities": entities, "relations": [], "tokens": []})
+        rows.append({"title": f"Titel {number}", "source": generator.choice(["SZ", "FAZ", "taz"]),
+                     "pubdate": "01.02.2020", "section": "Wissen", "byline": "Nicht angegeben",
+                     "flair_document": tagged_document})
+    return pd.DataFrame(rows)
+
+
+def extract_actors(tagged_document):
+    """
+    Former row-wise builder: one dictionary per actor with a copy of all sentences of the article.
+    :param tagged_document: tagged article (pandas.Series)
+    :return: list of dictionaries, one per actor
+    """
+    ner_dicts = tagged_document.flair_document
+    actors_list = []
+    for j, sentence in enumerate(ner_dicts):
+        for k, ent in enumerate(sentence["entities"]):
+            if ent["labels"][0]["value"] == "PER":
+                actors_list.append({"entity": ent["text"],
+                                    "article_title": tagged_document.title,
+                                    "article_source": tagged_document.source,
+                                    "article_pubdate": tagged_document.pubdate,
+                                    "article_section": tagged_document.section,
+                                    "article_byline": tagged_document.byline,
+                                    "sentence": sentence["text"],
+                                    "sentences": [sentence["text"] for sentence in ner_dicts],
+                                    "document_id": tagged_document.name + 1,
+                                    "sentence_id": j + 1,
+                                    "entity_id": make_entity_id(tagged_document.name + 1, j + 1, k + 1)})
+    return actors_list
+
+
+def row_wise(corpus):
+    """
+    :param corpus: tagged articles (pandas.DataFrame)
+    :return: actor dataset in the former layout (pandas.DataFrame)
+    """
+    actors_per_article = corpus.apply(extract_actors, axis=1)
+    all_actors = pd.DataFrame([actor for document in actors_per_article for actor in document])
+    all_actors["sentences_joined"] = all_actors.sentences.apply(lambda x: "<->".join(x))
+    return all_actors[actor_columns()]
+
+
+def columnar(corpus):
+    """
+    :param corpus: tagged articles (pandas.DataFrame)
+    :return: tables created by build_tables (dict of pandas.DataFrame)
+    """
+    return build_tables(corpus, corpus.flair_document)
+
+
+def same_actors(legacy, view):
+    """
+    Compare the values of both actor datasets. The dtypes are not compared, build_tables stores document_id and
+    sentence_id as 32-bit integers while the former layout has 64-bit integers.
+    :param legacy: actor dataset of row_wise (pandas.DataFrame)
+    :param view: actor dataset of actors_view (pandas.DataFrame)
+    :return: whether both contain the same actors in the same order (Bool)
+    """
+    try:
+        pd.testing.assert_frame_equal(legacy.reset_index(drop=True), view.reset_index(drop=True), check_dtype=False)
+    except AssertionError:
+        return False
+    return True
+
+
+def measure(function, corpus):
+    """
+    :param function: builder to measure (Callable)
+    :param corpus: tagged articles (pandas.DataFrame)
+    :return: tuple of the result, the run time in seconds (Float) and the peak of allocated memory in MB (Float)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(corpus)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the former row-wise actor extraction with the columnar "
+                                                 "build of the actor tables.")
+    parser.add_argument("--documents", type=int, default=7000, help="number of synthetic articles")
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.documents)
+    legacy, legacy_seconds, legacy_peak = measure(row_wise, corpus)
+    tables, seconds, peak = measure(columnar, corpus)
+    view, view_seconds, view_peak = measure(actors_view, tables)
+    print(f"{len(tables['actors'])} actors in {len(corpus)} articles")
+    print(f"{'row-wise apply(extract_actors)':<36}{legacy_seconds:8.2f} s {legacy_peak:10.1f} MB peak")
+    print(f"{'columnar build_tables':<36}{seconds:8.2f} s {peak:10.1f} MB peak")
+    print(f"{'former layout from the tables':<36}{view_seconds:8.2f} s {view_peak:10.1f} MB peak")
+    print(f"Same actors: {same_actors(legacy, view)}")
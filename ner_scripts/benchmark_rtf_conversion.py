@@ -0,0 +1,99 @@
+import argparse
+import io
+import os
+import random
+import time
+
+from striprtf.striprtf import rtf_to_text
+
+from ingestion.rtf import iter_rtf_text
+
+WORDS = ["Forschung", "Wissenschaft", "Gentechnik", "Regierung", "sagte", "Professorin", "Studie", "über", "für",
+         "Straße", "Universität", "Klimawandel", "Ergebnisse", "die", "der", "und", "nicht", "Künstliche", "Intelligenz"]
+
+
+def rtf_escape(text):
+    """
+    :param text: plain text (Str)
+    :return: text with umlauts and other non-ASCII characters as RTF escapes (Str)
+    """
+    escaped = []
+    for character in text:
+        if ord(character) < 128:
+            escaped.append(character)
+        elif character in "äöüÄÖÜß":
+            escaped.append(f"\\'{character.encode('cp1252').hex()}")
+        else:
+            escaped.append(f"\\u{ord(character)}?")
+    return "".join(escaped)
+
+
+def synthetic_export(documents, seed=0):
+    """
+    Build an RTF file that looks like a LexisNexis export, with a header, fonts, unicode and hex escapes, fields and
+    ignorable destinations.
+    :param documents: number of documents (Int)
+    :param seed: seed of the random generator (Int)
+    :return: RTF text (Str)
+    """
+    generator = random.Random(seed)
+    parts = [r"{\rtf1\ansi\ansicpg1252\deff0{\fonttbl{\f0\fswiss\fcharset0 Arial;}{\f1\froman\fcharset0 Times;}}"
+             r"{\colortbl;\red0\green0\blue0;}{\*\generator Nexis;}{\info{\title Export}{\author LexisNexis}}"
+             "\n"]
+    for number in range(documents):
+        sentences = " ".join(" ".join(generator.choice(WORDS) for _ in range(12)) + "." for _ in range(20))
+        parts.append(
+            r"{\pard\plain\f1\fs24 " + rtf_escape(f"Titel {number} – „{generator.choice(WORDS)}“") + r"\par}" "\n"
+            r"{\pard Süddeutsche Zeitung\par}{\pard January 1, 2020 Wednesday\par}" "\n"
+            r"{\pard Copyright 2020 {\*\bkmkstart b}Verlag\par}{\pard Section: WISSEN; S. 12\par}" "\n"
+            r"{\pard Length: 412 words\par}{\pard Byline: " + rtf_escape("Jörg Müller") + r"\par}" "\n"
+            r"{\pard\b Body\b0\par}" "\n"
+            r"{\pard\f0 " + rtf_escape(sentences) + r"\line\tab\emdash\~\par}" "\n"
+            r"{\field{\*\fldinst{HYPERLINK \"https://example.org\"}}{\fldrslt{\ul Link}}}" "\n"
+            r"{\pard Load-Date: January 2, 2020\par}{\pard End of Document\par}\page" "\n"
+        )
+    parts.append("}")
+    return "".join(parts)
+
+
+def measure(function, repeat):
+    """
+    :param function: function without arguments returning the plain text (Callable)
+    :param repeat: number of runs, the fastest counts (Int)
+    :return: tuple of the plain text (Str) and the fastest run time in seconds (Float)
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return text, best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare striprtf with the streaming RTF converter of the ingestion "
+                                                 "package on a LexisNexis export.")
+    parser.add_argument("filename", nargs="?", help="RTF export to convert; a synthetic export is used if omitted")
+    parser.add_argument("--documents", type=int, default=2000, help="number of documents of the synthetic export")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4], help="numbers of worker processes to test")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs per converter, the fastest counts")
+    args = parser.parse_args()
+
+    if args.filename:
+        with open(args.filename, encoding="cp1252") as file:
+            rtf = file.read()
+    else:
+        rtf = synthetic_export(args.documents)
+    size_mb = len(rtf) / 1024 / 1024
+    print(f"Input: {args.filename or 'synthetic export'}, {size_mb:.1f} MB")
+
+    expected, seconds = measure(lambda: rtf_to_text(rtf), args.repeat)
+    print(f"{'striprtf':<24}{seconds:8.2f} s {size_mb / seconds:8.2f} MB/s")
+    for workers in args.workers:
+        text, seconds = measure(
+            lambda: "".join(iter_rtf_text(io.StringIO(rtf), "End of Document", workers=workers)), args.repeat
+        )
+        status = "identical" if text == expected else "DIFFERENT"
+        print(f"{f'streaming, {workers} worker(s)':<24}{seconds:8.2f} s {size_mb / seconds:8.2f} MB/s  {status}")
+    print(f"CPU count: {os.cpu_count()}")
@@ -0,0 +1,12 @@
+import os
+
+from ingestion.tables import actors_view, read_tables
+
+
+if __name__ == '__main__':
+    dataset_name = input('Name of the file with the actors?')
+    actors_dataframe = actors_view(read_tables(os.path.join("daten", dataset_name)))
+    new_csv_file = f"{dataset_name[:-7]}csv"
+    actors_dataframe.to_csv(os.path.join("daten", new_csv_file), sep=",", index=False, encoding="UTF-8")
+    print(f"Created file {new_csv_file} containing all identified actors.")
+    input('\nPress Enter to exit.')
@@ -0,0 +1,9 @@
+"""
+Shared ingestion of press database exports: source adapters split and clean the articles of every export format, the
+pipeline tags them with the flair NER model and extracts the actors the same way for every source.
+"""
+from .adapters import GeniosTxtAdapter, LexisNexisRtfAdapter, SourceAdapter
+from .logs import close_log, create_log, print_progress_bar, write_log
+from .metrics import Metrics
+from .pipeline import build_parser, run_actors_pipeline, run_documents_pipeline
+from .reading import FallbackReader, detect_encoding, iter_articles
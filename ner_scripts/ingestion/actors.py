@@ -0,0 +1,81 @@
+import numpy as np
+
+ACTOR_COLUMNS = ["entity_id",
+                 "entity",
+                 "document_id",
+                 "article_title",
+                 "article_source",
+                 "article_pubdate",
+                 "article_section",
+                 "article_byline",
+                 "sentence_id",
+                 "sentence",
+                 "sentences_joined"]
+
+
+# Decimal digits of the fields in an entity_id: document_id, then 3 digits for the sentence and 2 for the entity. The
+# coding app (coding_app/codierapp_dissertation.R) relies on this layout: it numbers new interaction partners of an
+# article from paste0(document_id, "00001") and the statements of an actor from paste0(entity_id, "00"). Up to 999
+# sentences per article and 99 entities per sentence; the document_id is limited so that the statement ids of the app
+# stay exact in the doubles of R.
+SENTENCE_DIGITS = 3
+ENTITY_DIGITS = 2
+MAX_DOCUMENT_ID = (2 ** 53 - 1) // 10 ** (SENTENCE_DIGITS + ENTITY_DIGITS + 2)
+
+
+def check_field(values, maximum, name):
+    """
+    Raise an OverflowError if a field does not fit into its digits of the entity_id.
+    :param values: values of the field (Int or numpy.ndarray)
+    :param maximum: largest value of the field (Int)
+    :param name: name of the field in the error message (Str)
+    :return: None
+    """
+    values = np.asarray(values)
+    if values.size and (values.min() < 1 or values.max() > maximum):
+        raise OverflowError(f"{name} must be between 1 and {maximum} to fit into an entity_id, "
+                            f"found values from {values.min()} to {values.max()}.")
+
+
+def make_entity_id(document_id, sentence_id, entity_number):
+    """
+    Combine the ids of the article, the sentence and the entity into one integer, document_id * 100000 +
+    sentence_id * 100 + entity_number. The ids sort by article, sentence and entity, and a value that does not fit
+    raises an OverflowError instead of colliding with another id. Works on single ids and on numpy arrays.
+    :param document_id: id of the article, starting at 1 (Int or numpy.ndarray)
+    :param sentence_id: number of the sentence in the article, starting at 1 (Int or numpy.ndarray)
+    :param entity_number: number of the entity in the sentence, starting at 1 (Int or numpy.ndarray)
+    :return: id of the entity, unique in the dataset (Int or numpy.ndarray of int64)
+    """
+    check_field(document_id, MAX_DOCUMENT_ID, "document_id")
+    check_field(sentence_id, 10 ** SENTENCE_DIGITS - 1, "sentence_id")
+    check_field(entity_number, 10 ** ENTITY_DIGITS - 1, "entity_number")
+    if isinstance(document_id, np.ndarray):
+        document_id, sentence_id, entity_number = (np.asarray(values, dtype=np.int64)
+                                                   for values in (document_id, sentence_id, entity_number))
+    return (document_id * 10 ** (SENTENCE_DIGITS + ENTITY_DIGITS) + sentence_id * 10 ** ENTITY_DIGITS
+            + entity_number)
+
+
+def decode_entity_id(entity_id):
+    """
+    Split an entity_id created by make_entity_id into its fields.
+    :param entity_id: id of the entity (Int or numpy.ndarray)
+    :return: tuple of the document_id, the sentence_id and the number of the entity in the sentence (Int or
+    numpy.ndarray)
+    """
+    if not isinstance(entity_id, (int, np.integer)):
+        entity_id = np.asarray(entity_id, dtype=np.int64)
+    return (entity_id // 10 ** (SENTENCE_DIGITS + ENTITY_DIGITS),
+            entity_id // 10 ** ENTITY_DIGITS % 10 ** SENTENCE_DIGITS,
+            entity_id % 10 ** ENTITY_DIGITS)
+
+
+def actor_columns(extra_columns=()):
+    """
+    :param extra_columns: additional columns of the source adapter, placed after the article metadata (List[Str])
+    :return: columns of the actor dataset in the order they are written (List[Str])
+    """
+    position = ACTOR_COLUMNS.index("article_byline") + 1
+    return ACTOR_COLUMNS[:position] + list(extra_columns) + ACTOR_COLUMNS[position:]
+
@@ -0,0 +1,269 @@
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .logs import write_log
+from .reading import FallbackReader, detect_encoding, iter_articles
+
+
+NOT_SPECIFIED = "Nicht angegeben"
+NORMALIZATION_TABLE = str.maketrans({"\ufeff": " ", "\xa0": " "})
+MULTIPLE_SPACES = re.compile(r" {2,}")
+SPACE_BEFORE_NEWLINE = re.compile(r" \n")
+MULTIPLE_NEWLINES = re.compile(r"\n{2,}")
+
+
+def normalize_whitespace(content):
+    """
+    Replace byte order marks and non-breaking spaces and collapse runs of spaces and newlines.
+    :param content: raw text of an article (Str)
+    :return: normalised text (Str)
+    """
+    text = MULTIPLE_SPACES.sub(" ", content.translate(NORMALIZATION_TABLE).strip())
+    return MULTIPLE_NEWLINES.sub("\n", SPACE_BEFORE_NEWLINE.sub("\n", text))
+
+
+class SourceAdapter:
+    """
+    Interface of the export format of a press database. An adapter defines how an export file is split into articles
+    and how the metadata of an article is extracted; reading, cleaning, tagging and the extraction of actors are shared
+    by all sources. New sources are added by subclassing and implementing extract_metadata.
+    """
+    # name of the database in log messages
+    name = None
+    # string that terminates every article in the export file
+    delimiter = None
+    # columns returned by extract_metadata, in this order
+    columns = ["content_clean", "title", "source", "pubdate", "body", "byline", "section"]
+    # additional columns copied from the article to every actor
+    actor_columns = []
+    # value of "body" for articles whose body could not be found besides None
+    body_error = None
+
+    def iter_chunks(self, file, chunk_size):
+        """
+        :param file: export file, read as text (FallbackReader)
+        :param chunk_size: number of bytes read at once (Int)
+        :return: iterable of text chunks (Iterable[Str])
+        """
+        return iter(lambda: file.read(chunk_size), "")
+
+    def iter_documents(self, filename, chunk_size=1 << 20):
+        """
+        Stream the articles of an export file one at a time.
+        :param filename: name of the export file (Str)
+        :param chunk_size: number of bytes read from the file at once (Int)
+        :return: generator yielding the raw text of one article at a time (Str)
+        """
+        with open(filename, "rb") as file:
+            reader = FallbackReader(file, detect_encoding(filename))
+            yield from iter_articles(self.iter_chunks(reader, chunk_size), self.delimiter)
+
+    def extract_metadata(self, content):
+        """
+        Clean one article and extract its metadata.
+        :param content: raw text of the article (Str)
+        :return: tuple with one value for every column in columns
+        """
+        raise NotImplementedError
+
+    def read_articles(self, filename, logfile, chunk_size=1 << 20):
+        """
+        Read an export file and split it into single documents using the document structure.
+        :param filename: name of the export file with the articles (Str)
+        :param logfile:  name of the logfile created by the script (Str)
+        :param chunk_size: number of bytes read from the file at once (Int)
+        :return: Pandas DataFrame with one column (content) containing the articles
+        """
+        # the articles are the result, so memory grows with the corpus; only the reading itself is bounded
+        documents = pd.DataFrame({"content": np.fromiter(self.iter_documents(filename, chunk_size), dtype=object)})
+        write_log(f"{datetime.now()}: Read file {filename}. Found {len(documents)} articles.", logfile)
+        print(f"Found {len(documents)} articles.")
+        return documents
+
+    def clean_articles(self, documents, logfile):
+        """
+        Clean the articles and extract the metadata, article body and complete text.
+        :param documents: Pandas DataFrame with the articles. Must contain column "content" (pandas.DataFrame)
+        :param logfile: name of the logfile created by the script (Str)
+        :return: Pandas DataFrame with new columns for every entry in columns and the full text ("complete_text").
+        """
+        records = [self.extract_metadata(content) for content in documents.content]
+        documents[self.columns] = pd.DataFrame(records, columns=self.columns, index=documents.index)
+        unsuccessful_cases = (documents['body'].isna() | documents['body'].eq(self.body_error)).sum()
+        write_log(f"{datetime.now()}: Cleaned all articles. Was unsuccessful in {unsuccessful_cases} cases.", logfile)
+        print("Cleaned articles.")
+        documents["complete_text"] = documents["title"] + " " + documents["body"]
+        return documents
+
+
+HEADER_FOOTER_PATTERN = re.compile(
+    r"""^(?:Dokumente|Seite\s*\d+\s*von\s*\d+|Seite\s*\d+)$""",
+    flags=re.IGNORECASE | re.MULTILINE | re.VERBOSE
+)
+HEADER_PATTERN = re.compile(
+    r'^(?P<source>.+?)\s+vom\s+(?P<pubdate>\d{2}\.\d{2}\.\d{4}),.*\n'
+    r'(?P<title>.+?)\n',
+    flags=re.MULTILINE
+)
+AUTHOR_LINE_PATTERN = re.compile(
+    r'''(?x)
+        ^
+        (?P<author>
+          (?:[A-ZÄÖÜ][a-zäöüß]+
+              (?:[--][A-ZÄÖÜ][\wäöüß]+)*
+              (?:\s+[A-ZÄÖÜ][\wäöüß]+)*
+          )
+          (?:
+            \s*
+            (?:,|;|und)
+            \s*
+            (?:[A-ZÄÖÜ][a-zäöüß]+
+                (?:[--][A-ZÄÖÜ][\wäöüß]+)*
+                (?:\s+[A-ZÄÖÜ][\wäöüß]+)*
+                )
+            )*
+          )
+          \s*$
+          \n\s*Quelle:
+    ''',
+    flags=re.MULTILINE
+)
+SOURCE_NOTE_PATTERN = re.compile(r'\sQuelle:')
+FIRST_LINE_PATTERN = re.compile(r'^.+?\n', flags=re.MULTILINE)
+NEXT_LINE_PATTERN = re.compile(r'.+?\n')
+SECTION_MARKER_PATTERN = re.compile(r"\sRessort: ")
+SECTION_PATTERN = re.compile(r"\sRessort:\s([^;\n]*)")
+
+class GeniosTxtAdapter(SourceAdapter):
+    """
+    Text exports of GENIOS wiso. Articles end with the copyright note of GBI-Genios.
+    """
+    name = "GENIOS wiso"
+    delimiter = 'GBI-Genios Deutsche Wirtschaftsdatenbank GmbH'
+
+    def extract_metadata(self, content):
+        """
+        Clean one article from GENIOS wiso and extract all metadata in a single pass with the precompiled patterns.
+        Source, pubdate and title are taken from the header, the author from the line before "Quelle:", the body from
+        the text between the title and "Quelle:" without the author line, and the section from "Ressort:".
+        :param content: raw text of the article from GENIOS wiso (Str)
+        :return: tuple with the cleaned content, title, source, pubdate, article body (None if there is no "Quelle:"),
+        byline and section (Str)
+        """
+        text = normalize_whitespace(content)
+        text = MULTIPLE_NEWLINES.sub("\n", HEADER_FOOTER_PATTERN.sub("", text)).strip()
+
+        header = HEADER_PATTERN.search(text)
+        title, source, pubdate = header.group('title', 'source', 'pubdate') if header else (NOT_SPECIFIED,) * 3
+
+        author = AUTHOR_LINE_PATTERN.search(text)
+        byline = author.group('author').strip() if author else NOT_SPECIFIED
+
+        source_note = SOURCE_NOTE_PATTERN.search(text)
+        if source_note:
+            start_body = 0
+            header_line = FIRST_LINE_PATTERN.search(text)
+            if header_line:
+                start_body = header_line.end()
+                title_line = NEXT_LINE_PATTERN.search(text, start_body)
+                if title_line:
+                    start_body = title_line.end()
+            raw_body = re.sub(rf'^{re.escape(byline)}\s*$\n?', '', text[start_body:source_note.start()],
+                              flags=re.MULTILINE)
+            body = " ".join(raw_body.split())
+        else:
+            body = None
+
+        section = SECTION_PATTERN.search(text).group(1) if SECTION_MARKER_PATTERN.search(text) else NOT_SPECIFIED
+        return text, title, source, pubdate, body, byline, section
+
+
+LEXISNEXIS_HEADER_PATTERN = re.compile(r"([^\n]*)\n+([^\n]*)\n+([^\n]*)\n+")
+LENGTH_PATTERN = re.compile(r"\nLength: (\d+) ")
+BODY_END_PATTERNS = [re.compile(r'\sOriginal Gesamtseiten-PDF'), re.compile(r'\sGraphic\s'), re.compile(r'\sLoad-Date')]
+BODY_START_PATTERNS = [re.compile(r"\sPDF-Datei dieses Dokuments"), re.compile(r"\sBody"), re.compile(r"\sByline")]
+WHITESPACE_PATTERN = re.compile(r"\s+")
+BYLINE_MARKER_PATTERN = re.compile(r"\sByline:")
+HIGHLIGHT_MARKER_PATTERN = re.compile(r"\sHighlight:")
+BYLINE_BEFORE_HIGHLIGHT_PATTERN = re.compile(r"\sByline: ([\s\S]*?)Highlight:")
+BYLINE_BEFORE_BODY_PATTERN = re.compile(r"\sByline: ([\s\S]*?)Body")
+LEXISNEXIS_SECTION_MARKER_PATTERN = re.compile(r"\sSection: ")
+LEXISNEXIS_SECTION_PATTERN = re.compile(r"\sSection:\s([^;\n]*)")
+
+
+def first_match(patterns, document):
+    """
+    :param patterns: compiled patterns in order of preference (List)
+    :param document: text to search (Str)
+    :return: match of the first pattern found in the document, None if no pattern is found (re.Match)
+    """
+    for pattern in patterns:
+        match = pattern.search(document)
+        if match:
+            return match
+    return None
+
+
+class LexisNexisRtfAdapter(SourceAdapter):
+    """
+    RTF exports of LexisNexis. The RTF markup is removed while streaming and the articles are split at
+    "End of Document".
+    """
+    name = "LexisNexis"
+    delimiter = 'End of Document'
+    columns = ["content_clean", "title", "source", "pubdate", "length_article", "body", "byline", "section"]
+    actor_columns = ["length_article"]
+    body_error = "Fehler beim Auslesen des Inhalts"
+
+    def __init__(self, rtf_workers=1):
+        """
+        :param rtf_workers: number of processes converting the RTF export to plain text (Int)
+        """
+        self.rtf_workers = rtf_workers
+
+    def iter_chunks(self, file, chunk_size):
+        """
+        Convert the RTF file to plain text while reading it, see ingestion.rtf.iter_rtf_text.
+        :param file: export file, read as text (FallbackReader)
+        :param chunk_size: number of characters read at once (Int)
+        :return: generator yielding the plain text piece by piece (Str)
+        """
+        # striprtf is only needed for LexisNexis exports
+        from .rtf import iter_rtf_text
+        return iter_rtf_text(file, self.delimiter, chunk_size, workers=self.rtf_workers)
+
+    def extract_metadata(self, content):
+        """
+        Clean one article from LexisNexis and extract headline, source, pubdate, article length, body, byline and
+        section.
+        :param content: raw text of the article from LexisNexis (Str)
+        :return: tuple with the cleaned content, title, source, pubdate, article length (Int), article body, byline and
+        section (Str)
+        """
+        text = normalize_whitespace(content)
+        title, source, pubdate = LEXISNEXIS_HEADER_PATTERN.search(text).group(1, 2, 3)
+        length_article = int(LENGTH_PATTERN.search(text).group(1))
+
+        end_body = first_match(BODY_END_PATTERNS, text)
+        start_body = first_match(BODY_START_PATTERNS, text)
+        if end_body and start_body:
+            body = WHITESPACE_PATTERN.sub(" ", text[start_body.end():end_body.start()]).strip()
+        else:
+            body = self.body_error
+
+        if BYLINE_MARKER_PATTERN.search(text):
+            if HIGHLIGHT_MARKER_PATTERN.search(text):
+                byline = BYLINE_BEFORE_HIGHLIGHT_PATTERN.search(text).group(1).strip()
+            else:
+                byline = BYLINE_BEFORE_BODY_PATTERN.search(text).group(1).strip()
+        else:
+            byline = NOT_SPECIFIED
+
+        if LEXISNEXIS_SECTION_MARKER_PATTERN.search(text):
+            section = LEXISNEXIS_SECTION_PATTERN.search(text).group(1)
+        else:
+            section = NOT_SPECIFIED
+        return text, title, source, pubdate, length_article, body, byline, section
@@ -0,0 +1,96 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# Hashes and coefficients are below this prime (< 2^31), so hash * a + b stays below 2^63 and cannot wrap in uint64
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+class MinHasher:
+    """
+    MinHash signatures of the word shingles of a text. The Jaccard similarity of the shingle sets of two texts is
+    estimated by the share of equal values in their signatures.
+    """
+
+    def __init__(self, num_perm=128, shingle_size=5, seed=1):
+        """
+        :param num_perm: number of hash functions, i.e. length of the signatures (Int)
+        :param shingle_size: number of consecutive words per shingle (Int)
+        :param seed: seed of the hash functions, signatures are only comparable with the same seed (Int)
+        """
+        generator = np.random.RandomState(seed)
+        self.a = generator.randint(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = generator.randint(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.shingle_size = shingle_size
+
+    def shingles(self, text):
+        """
+        :param text: complete text of an article (Str)
+        :return: hashes of the distinct word shingles of the lower-cased text, reduced modulo MERSENNE_PRIME
+        (numpy.ndarray)
+        """
+        words = text.lower().split() if isinstance(text, str) else []
+        size = min(self.shingle_size, len(words))
+        shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)} if size else set()
+        return np.fromiter((zlib.crc32(shingle.encode("utf-8")) % MERSENNE_PRIME for shingle in shingles),
+                           dtype=np.uint64, count=len(shingles))
+
+    def signature(self, text):
+        """
+        :param text: complete text of an article (Str)
+        :return: MinHash signature, None for a text without words (numpy.ndarray)
+        """
+        hashes = self.shingles(text)
+        if not hashes.size:
+            return None
+        return ((hashes[:, None] * self.a + self.b) % MERSENNE_PRIME).min(axis=0)
+
+
+def find_near_duplicates(texts, threshold=0.8, num_perm=128, bands=16):
+    """
+    Cluster near-identical articles, e.g. agency copy printed by several outlets or regional editions. The articles are
+    read in the order of their document_id; an article joins the cluster of the most similar earlier representative
+    whose estimated Jaccard similarity reaches the threshold, otherwise it becomes the representative of a new cluster.
+    Every article is compared with representatives only, so clusters do not grow transitively over chains of similar
+    articles. Candidate representatives are found by cutting the signatures into bands and looking up the buckets of
+    the bands.
+    :param texts: complete text of every article, indexed like the DataFrame of the articles (pandas.Series)
+    :param threshold: minimal estimated Jaccard similarity of the word shingles of near-duplicates (Float)
+    :param num_perm: length of the MinHash signatures (Int)
+    :param bands: number of bands of the signatures, must divide num_perm (Int)
+    :return: Pandas DataFrame with columns document_id, representative_id and similarity (estimated Jaccard similarity
+    with the representative, 1.0 for the representatives)
+    """
+    rows = num_perm // bands
+    if rows * bands != num_perm:
+        raise ValueError(f"bands ({bands}) must divide num_perm ({num_perm}).")
+    hasher = MinHasher(num_perm)
+    document_ids = np.asarray(texts.index + 1)
+    signatures = [hasher.signature(text) for text in texts]
+    representatives = np.arange(len(signatures), dtype=np.int64)
+    similarity = np.ones(len(signatures))
+
+    buckets = [{} for _ in range(bands)]
+    for position, signature in enumerate(signatures):
+        if signature is None:
+            continue
+        keys = [signature[band * rows:(band + 1) * rows].tobytes() for band in range(bands)]
+        candidates = {candidate for bucket, key in zip(buckets, keys) for candidate in bucket.get(key, ())}
+        best, best_similarity = None, -1.0
+        for candidate in sorted(candidates):
+            candidate_similarity = float(np.mean(signature == signatures[candidate]))
+            if threshold <= candidate_similarity > best_similarity:
+                best, best_similarity = candidate, candidate_similarity
+        if best is None:
+            for bucket, key in zip(buckets, keys):
+                bucket.setdefault(key, []).append(position)
+        else:
+            representatives[position] = best
+            similarity[position] = best_similarity
+
+    return pd.DataFrame({
+        "document_id": document_ids,
+        "representative_id": document_ids[representatives],
+        "similarity": similarity,
+    })
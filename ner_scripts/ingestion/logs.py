@@ -0,0 +1,66 @@
+from datetime import datetime
+
+# logfiles opened by create_log or write_log, kept open for the whole run
+open_logs = {}
+
+
+def create_log(filename):
+    """
+    Creates a logfile.
+    :param filename: name of the logfile (Str)
+    :return: None
+    """
+    close_log(filename)
+    file = open_logs[filename] = open(filename, 'w')
+    timestamp = datetime.now()
+    file.write(str(timestamp) + ': Process started')
+    file.flush()
+
+
+def write_log(msg, logfile):
+    """
+    appends the given message to the given logfile. The file is opened on the first message and kept open.
+    :param msg: message to append (Str)
+    :param logfile: name of the logfile (Str)
+    :return: None
+    """
+    if logfile is not None:
+        if logfile not in open_logs:
+            open_logs[logfile] = open(logfile, 'a')
+        file = open_logs[logfile]
+        file.write('\n')
+        file.write(msg)
+        file.flush()
+
+
+def close_log(logfile):
+    """
+    Closes the given logfile if it is open.
+    :param logfile: name of the logfile (Str)
+    :return: None
+    """
+    file = open_logs.pop(logfile, None)
+    if file is not None:
+        file.close()
+
+
+def print_progress_bar(iteration, total, prefix='', suffix='', decimals=1, length=50, fill='█', print_end=""):
+    """
+    Call in a loop to create terminal progress bar
+    @params:
+        iteration   - Required  : current iteration (Int)
+        total       - Required  : total iterations (Int)
+        prefix      - Optional  : prefix string (Str)
+        suffix      - Optional  : suffix string (Str)
+        decimals    - Optional  : positive number of decimals in percent complete (Int)
+        length      - Optional  : character length of bar (Int)
+        fill        - Optional  : bar fill character (Str)
+        printEnd    - Optional  : end character (e.g. "\r", "\r\n") (Str)
+    """
+    percent = ("{0:." + str(decimals) + "f}").format(100 * (iteration / float(total)))
+    filled_length = int(length * iteration // total)
+    bar = fill * filled_length + '-' * (length - filled_length)
+    print(f'\r{prefix} |{bar}| {percent}% {suffix}', end=print_end)
+    # Print New Line on Complete
+    if iteration == total:
+        print()
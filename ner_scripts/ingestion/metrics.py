@@ -0,0 +1,182 @@
+import contextlib
+import json
+import math
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+# counts a stage can report, a throughput per second is computed for each of them
+RATE_COUNTS = ["documents", "sentences", "tokens"]
+PERCENTILES = [50, 90, 99]
+
+
+def percentile(values, percent):
+    """
+    :param values: sorted values (List[Float])
+    :param percent: percentile between 0 and 100 (Int)
+    :return: value at the percentile (nearest rank), None for no values (Float)
+    """
+    if not values:
+        return None
+    return round(values[max(0, math.ceil(percent / 100 * len(values)) - 1)], 4)
+
+
+class Metrics:
+    """
+    Structured timing and throughput metrics of a run. Every finished stage and every request to a language model is
+    written as one JSON object per line, and the aggregated values are written as a final summary line, so runs can be
+    compared with each other. The file is opened once for the whole run.
+    """
+
+    def __init__(self, filename=None, **context):
+        """
+        :param filename: name of the JSON Lines file the metrics are appended to, None to keep them in memory (Str)
+        :param context: values written with every line, e.g. the name of the script and of the dataset
+        """
+        self.file = open(filename, "a", encoding="utf-8") if filename is not None else None
+        self.context = {"run": uuid.uuid4().hex[:12], **context}
+        self.started = time.perf_counter()
+        self.stages = defaultdict(lambda: defaultdict(float))
+        self.latencies = defaultdict(list)
+        self.requests = defaultdict(lambda: defaultdict(int))
+        self.counters = defaultdict(int)
+
+    def emit(self, event, **fields):
+        """
+        Write one line of metrics.
+        :param event: type of the line, "stage", "request" or "summary" (Str)
+        :param fields: values of the line
+        :return: None
+        """
+        if self.file is not None:
+            line = {"time": datetime.now().isoformat(timespec="milliseconds"), "event": event, **self.context, **fields}
+            self.file.write(json.dumps(line, ensure_ascii=False) + "\n")
+            self.file.flush()
+
+    def add_stage(self, name, seconds, **counts):
+        """
+        Record the wall time and counts of a stage. A stage can be recorded several times, e.g. once per pool of
+        articles; the summary adds the values up.
+        :param name: name of the stage, e.g. "read", "clean" or "tag" (Str)
+        :param seconds: wall time of the stage (Float)
+        :param counts: processed units, e.g. documents, sentences or tokens (Int)
+        :return: None
+        """
+        stage = self.stages[name]
+        stage["calls"] += 1
+        stage["seconds"] += seconds
+        for key, value in counts.items():
+            stage[key] += value
+        rates = {f"{key}_per_sec": round(counts[key] / seconds, 2) for key in RATE_COUNTS if key in counts and seconds}
+        self.emit("stage", stage=name, seconds=round(seconds, 4), **counts, **rates)
+
+    @contextlib.contextmanager
+    def stage(self, name, **counts):
+        """
+        Measure the wall time of a block. Counts only known inside the block can be added to the yielded dictionary.
+        :param name: name of the stage (Str)
+        :param counts: processed units known before the block (Int)
+        :return: context manager yielding the dictionary of counts (dict)
+        """
+        counts = dict(counts)
+        start = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            self.add_stage(name, time.perf_counter() - start, **counts)
+
+    def add_request(self, name, seconds, tokens=0, cached=False, retries=0, failed=False, queued=0.0, backoff=0.0):
+        """
+        Record a request to a language model. The latency only covers the request itself; the time spent waiting for
+        rate limits or a free slot and the sleeps between retries are recorded separately, so the latency percentiles
+        describe the model and not the queue.
+        :param name: name of the question, i.e. of the tool (Str)
+        :param seconds: latency of the request, 0 for answers from a cache (Float)
+        :param tokens: number of tokens of the request and the answer (Int)
+        :param cached: whether the answer came from a cache (Bool)
+        :param retries: number of repeated attempts (Int)
+        :param failed: whether no answer was received (Bool)
+        :param queued: seconds spent waiting for rate limits and a free slot before sending (Float)
+        :param backoff: seconds slept between retries (Float)
+        :return: None
+        """
+        request = self.requests[name]
+        request["requests"] += 1
+        request["cached"] += bool(cached)
+        request["retries"] += retries
+        request["failed"] += bool(failed)
+        request["tokens"] += tokens
+        request["queued_seconds"] += queued
+        request["backoff_seconds"] += backoff
+        if not cached:
+            self.latencies[name].append(seconds)
+        self.emit("request", question=name, seconds=round(seconds, 4), tokens=tokens, cached=bool(cached),
+                  retries=retries, failed=bool(failed), queued=round(queued, 4), backoff=round(backoff, 4))
+
+    def increment(self, name, amount=1):
+        """
+        :param name: name of the counter, e.g. "ner_cache_hits" (Str)
+        :param amount: value added to the counter (Int)
+        :return: None
+        """
+        self.counters[name] += amount
+
+    def summary(self):
+        """
+        :return: dictionary with the aggregated stages, requests per question and counters of the run (dict)
+        """
+        stages = {}
+        for name, values in self.stages.items():
+            stages[name] = {key: round(value, 4) if key == "seconds" else int(value) for key, value in values.items()}
+            for key in RATE_COUNTS:
+                if key in values and values["seconds"]:
+                    stages[name][f"{key}_per_sec"] = round(values[key] / values["seconds"], 2)
+        requests = {}
+        for name, values in self.requests.items():
+            latencies = sorted(self.latencies[name])
+            seconds = sum(latencies)
+            requests[name] = {
+                **{key: round(value, 4) if key.endswith("_seconds") else value for key, value in values.items()},
+                "cache_hit_rate": round(values["cached"] / values["requests"], 4),
+                **{f"latency_p{percent}": percentile(latencies, percent) for percent in PERCENTILES},
+                "tokens_per_sec": round(values["tokens"] / seconds, 2) if seconds else None,
+            }
+        return {"seconds": round(time.perf_counter() - self.started, 4), "stages": stages, "requests": requests,
+                "counters": dict(self.counters)}
+
+    def summary_table(self):
+        """
+        :return: the summary of the run as a text table, one line per stage and per question (Str)
+        """
+        summary = self.summary()
+        lines = [f"{'stage':<22}{'seconds':>10}{'docs/s':>10}{'sent/s':>10}{'tokens/s':>10}"] if summary["stages"] else []
+        for name, values in summary["stages"].items():
+            rates = [values.get(f"{key}_per_sec") for key in RATE_COUNTS]
+            lines.append(f"{name:<22}{values['seconds']:>10.2f}"
+                         + "".join(f"{rate:>10.1f}" if rate is not None else f"{'':>10}" for rate in rates))
+        if summary["requests"]:
+            if lines:
+                lines.append("")
+            lines.append(f"{'question':<22}{'requests':>10}{'cached':>8}{'retries':>9}{'failed':>8}"
+                         f"{'p50 s':>8}{'p90 s':>8}{'p99 s':>8}")
+            for name, values in summary["requests"].items():
+                latencies = "".join(f"{value:>8.2f}" if value is not None else f"{'':>8}"
+                                    for value in (values[f"latency_p{percent}"] for percent in PERCENTILES))
+                lines.append(f"{name:<22}{values['requests']:>10}{values['cache_hit_rate']:>8.0%}"
+                             f"{values['retries']:>9}{values['failed']:>8}{latencies}")
+        if summary["counters"]:
+            lines.append("")
+            lines.extend(f"{name:<22}{value:>10}" for name, value in summary["counters"].items())
+        lines.append(f"{'total':<22}{summary['seconds']:>10.2f}")
+        return "\n".join(lines)
+
+    def close(self):
+        """
+        Write the summary line and close the file.
+        :return: None
+        """
+        self.emit("summary", **self.summary())
+        if self.file is not None:
+            self.file.close()
+            self.file = None
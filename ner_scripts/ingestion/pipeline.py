@@ -0,0 +1,189 @@
+import argparse
+import os
+from datetime import datetime
+
+from .dedup import find_near_duplicates
+from .logs import close_log, create_log, write_log
+from .metrics import Metrics
+from .store import TaggedDocumentStore, text_hash
+from .tables import actors_view, build_tables, write_tables
+
+
+def build_parser(description):
+    """
+    Command line options shared by all scripts that create an actor dataset.
+    :param description: description of the script (Str)
+    :return: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--mini-batch-size", type=int, default=32,
+                        help="number of sentences per forward pass of the NER model")
+    parser.add_argument("--pool-size", type=int, default=256,
+                        help="number of articles whose sentences are tagged together")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes tagging shards of the articles in parallel")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip the articles already in the store of tagged documents of an interrupted run")
+    parser.add_argument("--from-store", action="store_true",
+                        help="create the actor dataset from the store of tagged documents without loading the NER model")
+    parser.add_argument("--ner-cache", default=os.path.join("daten", "ner_cache.sqlite"),
+                        help="SQLite database caching tagged sentences across runs and corpora")
+    parser.add_argument("--no-ner-cache", action="store_true", help="tag every sentence without the NER cache")
+    parser.add_argument("--cache-size-mb", type=float, default=2048,
+                        help="size the NER cache is reduced to after the run by evicting least recently used sentences")
+    parser.add_argument("--dedup", action="store_true",
+                        help="tag only one representative per cluster of near-duplicate articles, the other articles of "
+                             "the cluster get its annotations")
+    parser.add_argument("--dedup-threshold", type=float, default=0.8,
+                        help="minimal estimated Jaccard similarity of the word shingles of near-duplicate articles")
+    parser.add_argument("--output-format", choices=["parquet", "csv", "both"], default="parquet",
+                        help="write the articles, sentences and actors as Parquet tables, the former actor CSV or both")
+    return parser
+
+
+def read_and_clean(adapter):
+    """
+    Ask for the names of the logfile and the export file, then read and clean the articles. The metrics of the run are
+    written next to the logfile, with the suffix _metrics.jsonl.
+    :param adapter: source adapter of the export file (SourceAdapter)
+    :return: tuple of the name of the logfile (Str), the name of the export file (Str), a Pandas DataFrame with the
+    cleaned articles and the metrics of the run (Metrics)
+    """
+    logfile = os.path.join('log', input('Name of the Logfile?'))
+    create_log(logfile)
+    dataset_name = input('Name of the file with the documents?')
+    metrics = Metrics(f"{os.path.splitext(logfile)[0]}_metrics.jsonl", adapter=adapter.name, dataset=dataset_name)
+    with metrics.stage("read") as counts:
+        articles_dataframe = adapter.read_articles(os.path.join('daten', dataset_name), logfile)
+        counts["documents"] = len(articles_dataframe)
+    with metrics.stage("clean", documents=len(articles_dataframe)):
+        articles_dataframe = adapter.clean_articles(articles_dataframe, logfile)
+    return logfile, dataset_name, articles_dataframe, metrics
+
+
+def finish_run(metrics, logfile):
+    """
+    Print the summary table of the metrics, append it to the logfile and close both.
+    :param metrics: metrics of the run (Metrics)
+    :param logfile: name of the logfile created by the script (Str)
+    :return: None
+    """
+    table = metrics.summary_table()
+    metrics.close()
+    print(table)
+    write_log(f"{datetime.now()}: Process terminated.\n{table}", logfile)
+    close_log(logfile)
+
+
+def run_actors_pipeline(adapter, args):
+    """
+    Create the dataset with all persons named in an export file: read, clean and tag the articles and write the actors
+    to Parquet tables or a CSV file.
+    :param adapter: source adapter of the export file (SourceAdapter)
+    :param args: command line options parsed with the parser of build_parser (argparse.Namespace)
+    :return: None
+    """
+    logfile, dataset_name, articles_dataframe, metrics = read_and_clean(adapter)
+
+    if not args.dedup:
+        articles_dataframe["representative_id"] = articles_dataframe.index + 1
+    else:
+        with metrics.stage("dedup", documents=len(articles_dataframe)):
+            clusters = find_near_duplicates(articles_dataframe.complete_text, args.dedup_threshold)
+        articles_dataframe["representative_id"] = clusters.representative_id.to_numpy()
+        clusters_file = f"article_clusters_from_{dataset_name[:-3]}csv"
+        clusters.to_csv(os.path.join("daten", clusters_file), sep=",", index=False, encoding="UTF-8")
+        duplicates = int((clusters.document_id != clusters.representative_id).sum())
+        write_log(f"{datetime.now()}: Found {duplicates} near-duplicate articles, they get the annotations of the "
+                  f"representative of their cluster. Created file {clusters_file} with the clusters.", logfile)
+        print(f"Found {duplicates} near-duplicate articles.")
+    representatives = articles_dataframe[articles_dataframe.representative_id == articles_dataframe.index + 1]
+
+    store_file = f"tagged_documents_from_{dataset_name[:-3]}jsonl"
+    store = TaggedDocumentStore(os.path.join("daten", store_file), resume=args.resume or args.from_store)
+    if args.from_store:
+        # A store written with --dedup only holds the representatives of the clusters. An article missing from the
+        # store takes the tags of a stored article with the same text, so such a store can be reused without --dedup.
+        hashes = articles_dataframe.complete_text.map(text_hash)
+        stored_ids, copies = set(), {}
+        for document_id, article_hash in zip(articles_dataframe.index + 1, hashes):
+            if store.document_hash(document_id) == article_hash:
+                stored_ids.add(document_id)
+                copies.setdefault(article_hash, document_id)
+        missing = ~articles_dataframe.representative_id.isin(stored_ids)
+        copied = missing & hashes.isin(copies)
+        articles_dataframe.loc[copied, "representative_id"] = hashes[copied].map(copies)
+        missing &= ~copied
+        if missing.any():
+            store.close()
+            hint = "" if args.dedup else (" If the store was written with --dedup, run again with --dedup and the "
+                                          "same --dedup-threshold.")
+            raise SystemExit(f"{int(missing.sum())} articles are not in {store_file}, run without --from-store to tag "
+                             f"them.{hint}")
+        if copied.any():
+            write_log(f"{datetime.now()}: {int(copied.sum())} articles are not in {store_file}, they get the "
+                      f"annotations of a stored article with the same text.", logfile)
+            print(f"{int(copied.sum())} articles get the annotations of a stored article with the same text.")
+        write_log(f"{datetime.now()}: Read annotated documents from {store_file}.", logfile)
+    else:
+        # flair and torch are only imported when articles are tagged
+        from .tagging import tag_articles
+
+        write_log(f"{datetime.now()}: Starting to annotate articles with flair NER model.", logfile)
+        print("Starting to annotate articles with flair NER model.")
+        with metrics.stage("tag_total", documents=len(representatives)):
+            tag_articles(
+                representatives, store, mini_batch_size=args.mini_batch_size, pool_size=args.pool_size,
+                workers=args.workers, cache_file=None if args.no_ner_cache else args.ner_cache,
+                cache_size_mb=args.cache_size_mb, logfile=logfile, metrics=metrics
+            )
+        write_log(f"{datetime.now()}: Finished annotating articles with flair NER model. "
+                  f"Annotated documents are in {store_file}.", logfile)
+        print("Finished annotating articles with flair NER model.")
+
+    with metrics.stage("extract", documents=len(articles_dataframe)) as counts:
+        tables = build_tables(articles_dataframe, store.iter_documents(articles_dataframe.representative_id),
+                              adapter.actor_columns + ["representative_id"])
+        counts["sentences"] = len(tables["sentences"])
+    store.close()
+    write_log(f"{datetime.now()}: Created dataset with all actors. Found {len(tables['actors'])}.", logfile)
+    print(f"Found {len(tables['actors'])} actors.")
+
+    if args.output_format in ("parquet", "both"):
+        with metrics.stage("write_parquet", documents=len(articles_dataframe)):
+            new_parquet_files = write_tables(tables, "daten", dataset_name)
+        for new_parquet_file in new_parquet_files:
+            write_log(f"{datetime.now()}: Created file {new_parquet_file}.", logfile)
+            print(f"Created file {new_parquet_file}.")
+    if args.output_format in ("csv", "both"):
+        new_csv_file = f"actors_from_{dataset_name[:-3]}csv"
+        with metrics.stage("write_csv", documents=len(articles_dataframe)):
+            actors_view(tables).to_csv(os.path.join("daten", new_csv_file), sep=",", index=False, encoding="UTF-8")
+        write_log(f"{datetime.now()}: Created file {new_csv_file} containing all identified actors", logfile)
+        print(f"Created file {new_csv_file} containing all identified actors.")
+    finish_run(metrics, logfile)
+    input('\nPress Enter to exit.')
+
+
+def run_documents_pipeline(adapter):
+    """
+    Create the dataset with the cleaned articles of an export file and write it to a CSV file.
+    :param adapter: source adapter of the export file (SourceAdapter)
+    :return: None
+    """
+    logfile, dataset_name, all_articles, metrics = read_and_clean(adapter)
+
+    new_csv_file = f"documents_from_{dataset_name[:-3]}csv"
+    with metrics.stage("write_csv", documents=len(all_articles)):
+        all_articles[
+            ["title",
+             "source",
+             "pubdate",
+             "body",
+             "byline",
+             "section"]
+        ].to_csv(os.path.join("daten", new_csv_file), sep=",", index=False, encoding="UTF-8")
+    write_log(f"{datetime.now()}: Created file {new_csv_file} containing all identified documents", logfile)
+    print(f"Created file {new_csv_file} containing all identified documents.")
+    finish_run(metrics, logfile)
+    input('\nPress Enter to exit.')
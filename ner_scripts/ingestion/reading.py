@@ -0,0 +1,78 @@
+import codecs
+
+
+def detect_encoding(filename, prefix_size=1 << 16):
+    """
+    Guess the encoding of an export file from a bounded prefix of its raw bytes, so the file is not read an extra time.
+    A multi-byte character cut at the end of the prefix does not count as an error. Decode errors after the prefix are
+    handled by FallbackReader.
+    :param filename: name of the file (Str)
+    :param prefix_size: number of bytes checked (Int)
+    :return: "utf-8" if the prefix is valid UTF-8, otherwise "cp1252", the Windows "ANSI" code page (Str)
+    """
+    with open(filename, "rb") as file:
+        prefix = file.read(prefix_size)
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(prefix, final=len(prefix) < prefix_size)
+    except UnicodeDecodeError:
+        return "cp1252"
+    return "utf-8"
+
+
+class FallbackReader:
+    """
+    Text reader over a file opened in binary mode, decoding it in a single pass. If the file is not valid UTF-8 after
+    all, the reader switches to cp1252 at the first decode error; the text before it was valid UTF-8 and is kept.
+    """
+
+    def __init__(self, file, encoding="utf-8"):
+        """
+        :param file: export file opened in binary mode
+        :param encoding: encoding detected by detect_encoding (Str)
+        """
+        self.file = file
+        self.encoding = encoding
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+
+    def read(self, size):
+        """
+        :param size: number of bytes read from the file (Int)
+        :return: decoded text, empty only at the end of the file (Str)
+        """
+        text = ""
+        while not text:
+            data = self.file.read(size)
+            pending = self.decoder.getstate()[0]
+            try:
+                text = self.decoder.decode(data, final=not data)
+            except UnicodeDecodeError:
+                self.encoding = "cp1252"
+                self.decoder = codecs.getincrementaldecoder("cp1252")()
+                text = self.decoder.decode(pending + data, final=not data)
+            if not data:
+                break
+        return text
+
+
+def iter_articles(chunks, delimiter):
+    """
+    Split a stream of text chunks into single documents, also finding delimiters that are cut by a chunk boundary.
+    Like str.split(delimiter)[:-1], the text after the last delimiter is dropped.
+    :param chunks: iterable of text chunks, e.g. iter(lambda: file.read(size), "") (Iterable[Str])
+    :param delimiter: string that terminates every document (Str)
+    :return: generator yielding one document at a time (Str)
+    """
+    buffer = ""
+    for chunk in chunks:
+        # only the tail of the old buffer can contain the beginning of a delimiter
+        search_start = max(len(buffer) - len(delimiter) + 1, 0)
+        buffer += chunk
+        end = buffer.find(delimiter, search_start)
+        if end == -1:
+            continue
+        start = 0
+        while end != -1:
+            yield buffer[start:end]
+            start = end + len(delimiter)
+            end = buffer.find(delimiter, start)
+        buffer = buffer[start:]
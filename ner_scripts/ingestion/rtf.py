@@ -0,0 +1,247 @@
+import codecs
+import copy
+import multiprocessing
+import re
+
+from striprtf.striprtf import (FONTTABLE, HYPERLINKS, charset_map, destinations, font_table_group, remove_pict_groups,
+                               sectionchars, specialchars)
+
+# Same tokens as striprtf, but plain text is matched in runs instead of one character at a time. The last group
+# is always the text, so the scan pattern can share the loop of the conversion.
+CONVERT_PATTERN = re.compile(
+    r"\\([a-z]{1,32})(-?\d{1,10})?[ ]?|\\'([0-9a-f]{2})|\\([^a-z])|([{}])|[\r\n]+|([^\\{}\r\n]+|.)",
+    re.IGNORECASE,
+)
+# Only the tokens that change the state of the parser; plain text is skipped by the regex engine.
+SCAN_PATTERN = re.compile(
+    r"\\([a-z]{1,32})(-?\d{1,10})?[ ]?|\\'([0-9a-f]{2})|\\([^a-z])|([{}])|(\\)",
+    re.IGNORECASE,
+)
+
+
+class RtfState:
+    """
+    State of the RTF parser that is carried from one segment of an export file to the next, so every segment can be
+    converted on its own.
+    """
+
+    def __init__(self, encoding="cp1252", errors="strict"):
+        """
+        :param encoding: encoding of hex escapes if the file has no codepage directive (Str)
+        :param errors: how to handle encoding errors, see bytes.decode (Str)
+        """
+        self.encoding = encoding
+        self.errors = errors
+        self.fonttbl = {}
+        self.stack = []
+        self.default_font = None
+        self.current_font = None
+        self.ignorable = False
+        self.suppress_output = False
+        self.ucskip = 1
+        self.curskip = 0
+        self.depth = 0
+        self.in_document = False
+        # set when the outer document group is closed, everything after it is discarded
+        self.finished = False
+
+    def read_font_table(self, text):
+        """
+        Read the charsets of the fonts from the font table in the header of the file.
+        :param text: beginning of the RTF file containing the header (Str)
+        :return: None
+        """
+        for font_id, fcharset, font_name in FONTTABLE.findall(font_table_group(text)):
+            self.fonttbl[font_id] = {
+                "name": font_name.strip(),
+                "charset": fcharset,
+                "encoding": charset_map.get(int(fcharset), self.encoding),
+            }
+
+
+def preprocess(text):
+    """
+    Remove binary pictures and rewrite hyperlinks like striprtf does before converting.
+    :param text: RTF text (Str)
+    :return: RTF text (Str)
+    """
+    return HYPERLINKS.sub("\\1(\\2)", remove_pict_groups(text))
+
+
+def process_rtf(text, state, output=True):
+    """
+    Convert a segment of an RTF file to plain text with the same rules as striprtf.rtf_to_text and advance the state
+    of the parser to the end of the segment. Without output, only the tokens that change the state are looked at, which
+    is a lot faster than converting.
+    :param text: preprocessed segment of the RTF file (Str)
+    :param state: state of the parser at the beginning of the segment, updated in place (RtfState)
+    :param output: whether to build the plain text (Bool)
+    :return: plain text of the segment, "" without output (Str)
+    """
+    if state.finished:
+        return ""
+    out = []
+    hexes = None
+    position = 0
+    for match in (CONVERT_PATTERN if output else SCAN_PATTERN).finditer(text):
+        word, arg, hex_, char, brace, run = match.groups()
+        if not output:
+            # the skipped plain text only matters while characters after a unicode character are skipped
+            if state.curskip > 0 and match.start() > position:
+                gap = text[position:match.start()]
+                state.curskip = max(0, state.curskip - (len(gap) - gap.count("\n") - gap.count("\r")))
+            position = match.end()
+        elif hexes and not hex_:
+            encoding = state.fonttbl.get(state.current_font, {"encoding": state.encoding}).get(
+                "encoding", state.encoding)
+            out.append(bytes.fromhex(hexes).decode(encoding=encoding, errors=state.errors))
+            hexes = None
+        if brace:
+            state.curskip = 0
+            if brace == "{":
+                state.depth += 1
+                state.in_document = True
+                state.stack.append((state.ucskip, state.ignorable, state.suppress_output))
+            else:
+                state.depth -= 1
+                if state.stack:
+                    state.ucskip, state.ignorable, state.suppress_output = state.stack.pop()
+                else:
+                    state.ucskip = 0
+                    state.ignorable = True
+                if state.in_document and state.depth <= 0:
+                    state.finished = True
+                    break
+        elif char:
+            state.curskip = 0
+            if char in specialchars:
+                if char in sectionchars:
+                    state.current_font = state.default_font
+                if not state.ignorable and output:
+                    out.append(specialchars[char])
+            elif char == "*":
+                state.ignorable = True
+        elif word:
+            state.curskip = 0
+            if word in destinations:
+                state.ignorable = True
+            elif word == "ansicpg":
+                state.encoding = f"cp{arg}"
+                try:
+                    codecs.lookup(state.encoding)
+                except LookupError:
+                    state.encoding = "utf8"
+            if state.ignorable or state.suppress_output:
+                pass
+            elif word in specialchars:
+                if output:
+                    out.append(specialchars[word])
+            elif word == "uc":
+                state.ucskip = int(arg)
+            elif word == "u":
+                if arg is not None:
+                    c = int(arg)
+                    if output:
+                        out.append(chr(c + 0x10000 if c < 0 else c))
+                state.curskip = state.ucskip
+            elif word == "f":
+                state.current_font = arg
+            elif word == "deff":
+                state.default_font = arg
+            elif word in ("fonttbl", "colortbl"):
+                state.suppress_output = True
+        elif hex_:
+            if state.curskip > 0:
+                state.curskip -= 1
+            elif not state.ignorable and output:
+                hexes = hex_ if not hexes else hexes + hex_
+        elif run:
+            if state.curskip > 0:
+                skipped = min(state.curskip, len(run))
+                state.curskip -= skipped
+                run = run[skipped:]
+            if run and not state.ignorable and not state.suppress_output and output:
+                out.append(run)
+    if not output and state.curskip > 0 and not state.finished:
+        gap = text[position:]
+        state.curskip = max(0, state.curskip - (len(gap) - gap.count("\n") - gap.count("\r")))
+    return "".join(out)
+
+
+def iter_raw_segments(file, delimiter, chunk_size):
+    """
+    Cut the raw RTF stream behind every occurrence of the delimiter. Each segment ends right after plain text, so no
+    escape sequence is cut in half.
+    :param file: RTF file opened in text mode
+    :param delimiter: text that ends every document, e.g. "End of Document" (Str)
+    :param chunk_size: number of characters read at once (Int)
+    :return: generator yielding the segments of the RTF file (Str)
+    """
+    buffer = ""
+    for chunk in iter(lambda: file.read(chunk_size), ""):
+        search_start = max(len(buffer) - len(delimiter) + 1, 0)
+        buffer += chunk
+        start = 0
+        end = buffer.find(delimiter, search_start)
+        while end != -1:
+            yield buffer[start:end + len(delimiter)]
+            start = end + len(delimiter)
+            end = buffer.find(delimiter, start)
+        buffer = buffer[start:]
+    if buffer:
+        yield buffer
+
+
+def convert_segment(job):
+    """
+    Convert one segment in a worker process.
+    :param job: tuple of the preprocessed segment (Str) and the state of the parser at its beginning (RtfState)
+    :return: plain text of the segment (Str)
+    """
+    segment, state = job
+    return process_rtf(segment, state)
+
+
+def iter_segment_jobs(segments, state):
+    """
+    Preprocess the segments and scan each one to find the state of the parser at the beginning of the next.
+    :param segments: raw segments of the RTF file (Iterable[Str])
+    :param state: state of the parser at the beginning of the file (RtfState)
+    :return: generator yielding tuples (preprocessed segment, state at its beginning)
+    """
+    for index, segment in enumerate(segments):
+        segment = preprocess(segment)
+        if index == 0:
+            state.read_font_table(segment)
+        start = copy.deepcopy(state)
+        process_rtf(segment, state, output=False)
+        yield segment, start
+        if state.finished:
+            break
+
+
+def iter_rtf_text(file, delimiter, chunk_size=1 << 20, workers=1):
+    """
+    Convert an RTF export to plain text while reading it. The raw RTF is cut behind every delimiter and the segments
+    are converted one after the other or, with more than one worker, in a process pool; the parent process only scans
+    the control words to hand each segment the parser state it starts with. The concatenated text equals
+    striprtf.rtf_to_text of the whole file, unless a hyperlink or binary picture contains the delimiter.
+    :param file: RTF file opened in text mode
+    :param delimiter: text that ends every document, e.g. "End of Document" (Str)
+    :param chunk_size: number of characters read at once (Int)
+    :param workers: number of processes converting segments (Int)
+    :return: generator yielding the plain text of one segment at a time (Str)
+    """
+    state = RtfState()
+    segments = iter_raw_segments(file, delimiter, chunk_size)
+    if workers > 1:
+        with multiprocessing.get_context("spawn").Pool(workers) as pool:
+            yield from pool.imap(convert_segment, iter_segment_jobs(segments, state), chunksize=8)
+        return
+    for index, segment in enumerate(segments):
+        segment = preprocess(segment)
+        if index == 0:
+            state.read_font_table(segment)
+        yield process_rtf(segment, state)
+        if state.finished:
+            break
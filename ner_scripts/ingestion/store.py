@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import struct
+
+# document_id, byte offset and length of the line, SHA-1 digest of the complete text of the article
+INDEX_RECORD = struct.Struct("<qQI20s")
+
+
+def text_hash(text):
+    """
+    Hash the text of an article to recognise it in the store of tagged documents.
+    :param text: complete text of the article (Str)
+    :return: SHA-1 hex digest of the text (Str)
+    """
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class TaggedDocumentStore:
+    """
+    Append-only store of tagged articles: a JSON Lines file with one article per line and a binary index with the byte
+    offset of every line. Every article is flushed as soon as it is tagged, so the store is the checkpoint of an
+    interrupted run as well as the backup of the tagged documents, and a single article can be read by its document_id
+    or text hash without parsing the rest of the file.
+    """
+
+    def __init__(self, filename, resume=False):
+        """
+        :param filename: name of the JSON Lines file, the index is written next to it with the extension .idx (Str)
+        :param resume: whether to keep the articles of an earlier run; otherwise an existing store is overwritten (Bool)
+        """
+        self.filename = filename
+        self.index_filename = os.path.splitext(filename)[0] + ".idx"
+        self.by_document = {}
+        self.by_hash = {}
+        if resume and os.path.exists(filename):
+            if os.path.exists(self.index_filename):
+                self.load_index()
+            else:
+                self.rebuild_index()
+        else:
+            open(filename, "wb").close()
+            open(self.index_filename, "wb").close()
+        self.data = open(filename, "ab")
+        self.index = open(self.index_filename, "ab")
+        self.reader = open(filename, "rb")
+
+    def add_to_index(self, document_id, offset, length, digest):
+        self.by_document[document_id] = (offset, length, digest.hex())
+        self.by_hash[digest.hex()] = (offset, length)
+
+    def load_index(self):
+        """
+        Read the index and drop the records of lines that were cut off by a crash, then cut off the incomplete last
+        line of the JSON Lines file, if any.
+        :return: None
+        """
+        with open(self.filename, "rb+") as file:
+            end = file.seek(0, os.SEEK_END)
+            while end > 0:
+                start = max(end - 65536, 0)
+                file.seek(start)
+                newline = file.read(end - start).rfind(b"\n")
+                if newline != -1:
+                    end = start + newline + 1
+                    break
+                end = start
+            file.truncate(end)
+        with open(self.index_filename, "rb+") as file:
+            records = file.read()
+            valid = 0
+            for document_id, offset, length, digest in INDEX_RECORD.iter_unpack(
+                    records[:len(records) - len(records) % INDEX_RECORD.size]):
+                if offset + length > end:
+                    break
+                self.add_to_index(document_id, offset, length, digest)
+                valid += INDEX_RECORD.size
+            file.truncate(valid)
+
+    def rebuild_index(self):
+        """
+        Rebuild a missing index by reading the JSON Lines file once.
+        :return: None
+        """
+        offset = 0
+        with open(self.filename, "rb+") as file, open(self.index_filename, "wb") as index:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                digest = bytes.fromhex(entry["text_hash"])
+                index.write(INDEX_RECORD.pack(entry["document_id"], offset, len(line), digest))
+                self.add_to_index(entry["document_id"], offset, len(line), digest)
+                offset += len(line)
+            file.truncate(offset)
+
+    def append(self, document_id, text_hash, flair_document):
+        """
+        Append a tagged article and flush it to disk.
+        :param document_id: id of the article (Int)
+        :param text_hash: hash of the complete text of the article, see text_hash (Str)
+        :param flair_document: tagged sentences of the article (list of dictionaries)
+        :return: None
+        """
+        line = (json.dumps({"document_id": int(document_id), "text_hash": text_hash, "flair_document": flair_document},
+                           ensure_ascii=False) + "\n").encode("utf-8")
+        offset = self.data.tell()
+        self.data.write(line)
+        self.data.flush()
+        digest = bytes.fromhex(text_hash)
+        self.index.write(INDEX_RECORD.pack(int(document_id), offset, len(line), digest))
+        self.index.flush()
+        self.add_to_index(int(document_id), offset, len(line), digest)
+
+    def hashes(self):
+        """
+        :return: hashes of all articles in the store (Set[Str])
+        """
+        return set(self.by_hash)
+
+    def document_hash(self, document_id):
+        """
+        :param document_id: id of the article (Int)
+        :return: hash of the article stored under the document_id, None if there is none (Str)
+        """
+        entry = self.by_document.get(int(document_id))
+        return entry[2] if entry else None
+
+    def read(self, offset, length):
+        self.reader.seek(offset)
+        return json.loads(self.reader.read(length))["flair_document"]
+
+    def get(self, document_id):
+        """
+        :param document_id: id of the article (Int)
+        :return: tagged sentences of the article (list of dictionaries)
+        """
+        offset, length, _ = self.by_document[int(document_id)]
+        return self.read(offset, length)
+
+    def get_by_hash(self, text_hash):
+        """
+        :param text_hash: hash of the complete text of the article (Str)
+        :return: tagged sentences of the article (list of dictionaries)
+        """
+        return self.read(*self.by_hash[text_hash])
+
+    def iter_documents(self, document_ids):
+        """
+        :param document_ids: ids of the articles (Iterable[Int])
+        :return: generator yielding the tagged sentences of the articles in the given order (list of dictionaries)
+        """
+        for document_id in document_ids:
+            yield self.get(document_id)
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+        self.reader.close()
@@ -0,0 +1,138 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from .actors import actor_columns, make_entity_id
+
+# metadata of the articles, written as article_<column> in the actor dataset
+ARTICLE_COLUMNS = ["title", "source", "pubdate", "section", "byline"]
+# columns with few distinct values repeated over many rows
+DICTIONARY_COLUMNS = {
+    "articles": ARTICLE_COLUMNS,
+    "sentences": [],
+    "actors": ["entity"],
+}
+
+
+def positions_in_groups(group_sizes):
+    """
+    :param group_sizes: number of elements in each group (numpy.ndarray)
+    :return: position of every element in its group, starting at 1 (numpy.ndarray)
+    """
+    starts = np.repeat(np.cumsum(group_sizes) - group_sizes, group_sizes)
+    return np.arange(1, len(starts) + 1) - starts
+
+
+def build_tables(articles, tagged_documents, extra_columns=()):
+    """
+    Normalise the tagged articles into three tables, so the text of an article is stored once instead of once per
+    actor: articles (document_id and metadata), sentences (document_id, sentence_id, sentence) and actors (entity_id,
+    entity, document_id, sentence_id). The tagged documents are read once, collecting only the sentence texts, the
+    number of entities per sentence and the entities; all ids are then computed for whole columns at once. document_id
+    and sentence_id are stored as 32-bit integers, so the tables are joined on compact keys.
+    :param articles: Pandas DataFrame with the cleaned articles. Must contain the metadata columns (pandas.DataFrame)
+    :param tagged_documents: tagged sentences of every article in the order of the DataFrame, e.g. read from the store
+    of tagged documents (Iterable of lists of dictionaries)
+    :param extra_columns: additional metadata columns of the source adapter, e.g. length_article (List[Str])
+    :return: dictionary with the tables "articles", "sentences" and "actors" (dict of pandas.DataFrame)
+    """
+    document_ids = np.asarray(articles.index + 1, dtype=np.int32)
+    sentences_per_document = []
+    sentence_texts = []
+    entities_per_sentence = []
+    entities = []
+    for tagged_document in tagged_documents:
+        sentences_per_document.append(len(tagged_document))
+        for sentence in tagged_document:
+            sentence_texts.append(sentence["text"])
+            entities_per_sentence.append(len(sentence["entities"]))
+            entities.extend(sentence["entities"])
+
+    sentences_per_document = np.array(sentences_per_document, dtype=np.int64)
+    sentence_documents = np.repeat(document_ids, sentences_per_document)
+    sentence_ids = positions_in_groups(sentences_per_document).astype(np.int32)
+    entities_per_sentence = np.array(entities_per_sentence, dtype=np.int64)
+    is_person = np.fromiter((entity["labels"][0]["value"] == "PER" for entity in entities), dtype=bool,
+                            count=len(entities))
+    actor_documents = np.repeat(sentence_documents, entities_per_sentence)[is_person]
+    actor_sentences = np.repeat(sentence_ids, entities_per_sentence)[is_person]
+    entity_numbers = positions_in_groups(entities_per_sentence)[is_person]
+
+    article_table = articles[ARTICLE_COLUMNS + list(extra_columns)].copy()
+    article_table.insert(0, "document_id", document_ids)
+    return {
+        "articles": article_table.reset_index(drop=True),
+        "sentences": pd.DataFrame({"document_id": sentence_documents, "sentence_id": sentence_ids,
+                                   "sentence": sentence_texts}),
+        "actors": pd.DataFrame({
+            "entity_id": make_entity_id(actor_documents, actor_sentences, entity_numbers),
+            "entity": [entity["text"] for entity, person in zip(entities, is_person) if person],
+            "document_id": actor_documents,
+            "sentence_id": actor_sentences,
+        }),
+    }
+
+
+def table_file(name, dataset_name):
+    """
+    :param name: name of the table (Str)
+    :param dataset_name: name of the export file the tables are created from (Str)
+    :return: name of the Parquet file of the table (Str)
+    """
+    return f"{name}_from_{dataset_name[:-3]}parquet"
+
+
+def write_tables(tables, directory, dataset_name):
+    """
+    Write the tables as Parquet files with dictionary encoding and zstd compression. Needs pyarrow.
+    :param tables: tables created by build_tables (dict of pandas.DataFrame)
+    :param directory: directory of the files (Str)
+    :param dataset_name: name of the export file the tables are created from (Str)
+    :return: names of the written files (List[Str])
+    """
+    files = []
+    for name, table in tables.items():
+        files.append(table_file(name, dataset_name))
+        table.to_parquet(os.path.join(directory, files[-1]), engine="pyarrow", index=False, compression="zstd",
+                         use_dictionary=DICTIONARY_COLUMNS[name] or False)
+    return files
+
+
+def read_tables(actors_file):
+    """
+    Read the three tables written by write_tables. Needs pyarrow.
+    :param actors_file: path of the Parquet file with the actors, the other tables are expected next to it (Str)
+    :return: dictionary with the tables "articles", "sentences" and "actors" (dict of pandas.DataFrame)
+    """
+    directory, actors_name = os.path.split(actors_file)
+    if not actors_name.startswith("actors_from_"):
+        raise ValueError(f"{actors_file} is not an actors table written by write_tables.")
+    return {name: pd.read_parquet(os.path.join(directory, actors_name.replace("actors_from_", f"{name}_from_", 1)),
+                                  engine="pyarrow")
+            for name in ["articles", "sentences", "actors"]}
+
+
+def actors_view(tables):
+    """
+    Rebuild the actor dataset in the layout of the former CSV output, with the article metadata, the sentence and all
+    sentences of the article joined with "<->" on every row. If near-duplicate articles were clustered (--dedup) and at
+    least one article is a duplicate, representative_id is kept as the last column, so the classification of the
+    actors can hand the codings of a representative on to its duplicates.
+    :param tables: tables created by build_tables or read by read_tables (dict of pandas.DataFrame)
+    :return: Pandas DataFrame with the columns of actor_columns, followed by representative_id for clustered articles
+    """
+    articles = tables["articles"]
+    extra_columns = [column for column in articles.columns
+                     if column not in ["document_id", "representative_id"] + ARTICLE_COLUMNS]
+    sentences = tables["sentences"]
+    sentences_joined = sentences.groupby("document_id", sort=False).sentence.agg("<->".join)
+    view = tables["actors"].merge(
+        articles.rename(columns={column: f"article_{column}" for column in ARTICLE_COLUMNS}),
+        on="document_id", how="left"
+    ).merge(sentences, on=["document_id", "sentence_id"], how="left")
+    view["sentences_joined"] = view.document_id.map(sentences_joined)
+    columns = actor_columns(extra_columns)
+    if "representative_id" in articles and (articles.representative_id != articles.document_id).any():
+        columns.append("representative_id")
+    return view[columns]
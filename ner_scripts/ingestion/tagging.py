@@ -0,0 +1,260 @@
+import contextlib
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+import unicodedata
+from datetime import datetime
+
+import flair
+import torch
+
+from .logs import print_progress_bar, write_log
+from .store import text_hash
+
+MODEL_NAME = "de-ner"
+
+
+def iter_pools(articles, pool_size):
+    """
+    Group consecutive articles into pools whose sentences are tagged together.
+    :param articles: Pandas DataFrame with the cleaned articles. Must contain column "complete_text" (pandas.DataFrame)
+    :param pool_size: number of articles per pool (Int)
+    :return: generator yielding lists of tuples (document_id, complete_text)
+    """
+    pool = []
+    for index, text in articles.complete_text.items():
+        pool.append((index + 1, text))
+        if len(pool) == pool_size:
+            yield pool
+            pool = []
+    if pool:
+        yield pool
+
+
+class NerCache:
+    """
+    Persistent cache of tagged sentences in an SQLite database, shared by all corpora and runs. Sentences are keyed by
+    a hash of their normalised text together with the name of the NER model and the flair version, so wire stories
+    printed by several outlets are tagged only once. Every hit refreshes the entry, so evict removes the least
+    recently used sentences first.
+    """
+
+    def __init__(self, filename, model_name):
+        """
+        :param filename: name of the SQLite database (Str)
+        :param model_name: name of the flair NER model the sentences are tagged with (Str)
+        """
+        self.model_key = f"{model_name}@{flair.__version__}"
+        self.connection = sqlite3.connect(filename, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS ner_cache "
+            "(key TEXT PRIMARY KEY, sentence TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS ner_cache_last_used ON ner_cache (last_used)")
+        self.connection.commit()
+
+    def key(self, text):
+        """
+        :param text: text of a sentence (Str)
+        :return: cache key of the sentence for the model of the cache (Str)
+        """
+        normalized = " ".join(unicodedata.normalize("NFC", text).split())
+        return hashlib.sha256(f"{self.model_key}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys, batch_size=500):
+        """
+        Look up tagged sentences and mark the hits as recently used.
+        :param keys: cache keys of the sentences (Iterable[Str])
+        :param batch_size: number of keys per query (Int)
+        :return: dictionary with the tagged sentences (dict) of all keys found in the cache
+        """
+        keys = list(set(keys))
+        found = {}
+        with self.connection:
+            for start in range(0, len(keys), batch_size):
+                batch = keys[start:start + batch_size]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.connection.execute(
+                    f"SELECT key, sentence FROM ner_cache WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update((key, json.loads(sentence)) for key, sentence in rows)
+            self.connection.executemany(
+                "UPDATE ner_cache SET last_used = ? WHERE key = ?", [(time.time(), key) for key in found]
+            )
+        return found
+
+    def put_many(self, sentences):
+        """
+        Store tagged sentences.
+        :param sentences: dictionary cache key -> tagged sentence (dict)
+        :return: None
+        """
+        rows = []
+        for key, sentence in sentences.items():
+            serialized = json.dumps(sentence, ensure_ascii=False)
+            rows.append((key, serialized, len(serialized.encode("utf-8")), time.time()))
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO ner_cache VALUES (?, ?, ?, ?)", rows)
+
+    def evict(self, max_size_mb):
+        """
+        Remove the least recently used sentences until the cache is not larger than the given size.
+        :param max_size_mb: maximum size of the cached sentences in megabytes (Float)
+        :return: number of removed sentences (Int)
+        """
+        excess = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM ner_cache").fetchone()[0]
+        excess -= max_size_mb * 1024 * 1024
+        evicted = []
+        for key, size in self.connection.execute("SELECT key, size FROM ner_cache ORDER BY last_used"):
+            if excess <= 0:
+                break
+            evicted.append((key,))
+            excess -= size
+        with self.connection:
+            self.connection.executemany("DELETE FROM ner_cache WHERE key = ?", evicted)
+        return len(evicted)
+
+    def close(self):
+        self.connection.close()
+
+
+def tag_pool(pool, splitter, tagger, mini_batch_size, cache=None):
+    """
+    Split a pool of articles into sentences and tag the sentences of all articles with the flair NER model at once.
+    flair sorts the pooled sentences by length before cutting them into mini batches, so the batches are evenly filled.
+    Sentences found in the cache are not tagged again, the newly tagged sentences are added to it.
+    :param pool: list of tuples (document_id, complete_text)
+    :param splitter: flair sentence splitter (flair.splitter.SentenceSplitter)
+    :param tagger: flair NER model (flair.models.SequenceTagger)
+    :param mini_batch_size: number of sentences per forward pass (Int)
+    :param cache: cache of tagged sentences, None to tag every sentence (NerCache)
+    :return: tuple of a list of tuples (document_id, list of dictionaries with the tagged sentences), the number of
+    cache hits (Int), the number of tagged sentences (Int) and a dictionary with the seconds spent splitting ("split")
+    and tagging ("tag") and the number of tokens ("tokens")
+    """
+    start = time.perf_counter()
+    documents = [(document_id, splitter.split(text)) for document_id, text in pool]
+    sentences = [sentence for _, document in documents for sentence in document]
+    split_seconds = time.perf_counter() - start
+    if cache is not None:
+        keys = [cache.key(sentence.to_original_text()) for sentence in sentences]
+        cached = cache.get_many(keys)
+    else:
+        keys = [None] * len(sentences)
+        cached = {}
+    misses = [sentence for sentence, key in zip(sentences, keys) if key not in cached]
+    tagger.predict(misses, mini_batch_size=mini_batch_size)
+    tagged_sentences = [cached[key] if key in cached else sentence.to_dict(tag_type='ner')
+                        for sentence, key in zip(sentences, keys)]
+    if cache is not None:
+        cache.put_many({key: tagged for key, tagged in zip(keys, tagged_sentences) if key not in cached})
+    tagged_sentences = iter(tagged_sentences)
+    tagged_documents = [(document_id, [next(tagged_sentences) for _ in document]) for document_id, document in documents]
+    timings = {"split": split_seconds, "tag": time.perf_counter() - start - split_seconds,
+               "tokens": sum(len(sentence) for sentence in sentences)}
+    return tagged_documents, len(sentences) - len(misses), len(misses), timings
+
+
+worker_state = {}
+
+
+def init_worker(mini_batch_size, cache_file=None, num_threads=None):
+    """
+    Load the sentence splitter and the flair NER model and open the NER cache once per process.
+    :param mini_batch_size: number of sentences per forward pass (Int)
+    :param cache_file: name of the SQLite database with the NER cache, None to tag without cache (Str)
+    :param num_threads: number of torch threads of the process, None keeps the torch default (Int)
+    :return: None
+    """
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+    worker_state["splitter"] = flair.splitter.SegtokSentenceSplitter()
+    worker_state["tagger"] = flair.models.SequenceTagger.load(MODEL_NAME)
+    worker_state["mini_batch_size"] = mini_batch_size
+    worker_state["cache"] = NerCache(cache_file, MODEL_NAME) if cache_file is not None else None
+
+
+def tag_pool_in_worker(pool):
+    """
+    Tag a pool of articles with the splitter and model loaded by init_worker.
+    :param pool: list of tuples (document_id, complete_text)
+    :return: see tag_pool
+    """
+    return tag_pool(pool, worker_state["splitter"], worker_state["tagger"], worker_state["mini_batch_size"],
+                    worker_state["cache"])
+
+
+def tag_articles(articles, store, mini_batch_size=32, pool_size=256, workers=1, cache_file=None, cache_size_mb=None,
+                 logfile=None, metrics=None):
+    """
+    Tag all articles with the flair NER model, pooling the sentences of several articles into each prediction call.
+    With more than one worker, the pools are shards of consecutive document_ids that are tagged in separate processes.
+    The pools do not depend on the number of workers and the results are merged in document order, so the output is
+    the same for every number of workers. Every tagged article is flushed to the store right away, so an interrupted
+    run can be resumed without tagging the articles already in the store again. Sentences already in the NER cache are
+    taken from there instead of being tagged. With metrics, the seconds spent splitting and tagging are recorded per
+    pool; with several workers they are the summed times of all processes, not the wall time of the run.
+    :param articles: Pandas DataFrame with the cleaned articles. Must contain column "complete_text" (pandas.DataFrame)
+    :param store: store the tagged articles are appended to, opened with resume to skip its articles (TaggedDocumentStore)
+    :param mini_batch_size: number of sentences per forward pass (Int)
+    :param pool_size: number of articles whose sentences are tagged together (Int)
+    :param workers: number of worker processes (Int)
+    :param cache_file: name of the SQLite database with the NER cache, None to tag without cache (Str)
+    :param cache_size_mb: size in megabytes the NER cache is reduced to after tagging, None for no limit (Float)
+    :param logfile: name of the logfile created by the script (Str)
+    :param metrics: metrics of the run, None to record none (Metrics)
+    :return: None, the tagged sentences of every article can be read from the store by its document_id
+    """
+    hashes = articles.complete_text.map(text_hash)
+    stored = store.hashes()
+    done_articles = hashes.isin(stored)
+    for document_id, article_hash in zip(articles.index[done_articles.to_numpy()] + 1, hashes[done_articles]):
+        # an article tagged in an earlier run under another document_id, e.g. after the export was changed
+        if store.document_hash(document_id) != article_hash:
+            store.append(document_id, article_hash, store.get_by_hash(article_hash))
+    pending = articles[~done_articles]
+    done = len(articles) - len(pending)
+    if done:
+        print(f"Resuming with {done} articles from the store of tagged documents.")
+    with contextlib.ExitStack() as stack:
+        if pending.empty:
+            results = []
+        elif workers > 1:
+            executor = stack.enter_context(multiprocessing.get_context("spawn").Pool(
+                workers, initializer=init_worker,
+                initargs=(mini_batch_size, cache_file, max(1, os.cpu_count() // workers))
+            ))
+            results = executor.imap(tag_pool_in_worker, iter_pools(pending, pool_size))
+        else:
+            init_worker(mini_batch_size, cache_file)
+            results = map(tag_pool_in_worker, iter_pools(pending, pool_size))
+        hits = misses = 0
+        for result, pool_hits, pool_misses, timings in results:
+            hits += pool_hits
+            misses += pool_misses
+            if metrics is not None:
+                sentences = pool_hits + pool_misses
+                metrics.add_stage("split", timings["split"], documents=len(result), sentences=sentences)
+                metrics.add_stage("tag", timings["tag"], documents=len(result), sentences=sentences,
+                                  tokens=timings["tokens"])
+            for document_id, sentences in result:
+                store.append(document_id, hashes[document_id - 1], sentences)
+            done += len(result)
+            print_progress_bar(done, len(articles))
+    if metrics is not None:
+        metrics.increment("ner_cache_hits", hits)
+        metrics.increment("ner_tagged_sentences", misses)
+    if cache_file is not None:
+        hit_rate = hits / (hits + misses) if hits + misses else 0
+        write_log(f"{datetime.now()}: NER cache hits: {hits}, tagged sentences: {misses} "
+                  f"(hit rate {hit_rate:.1%}).", logfile)
+        print(f"NER cache hit rate: {hit_rate:.1%} of {hits + misses} sentences.")
+        if cache_size_mb is not None:
+            cache = NerCache(cache_file, MODEL_NAME)
+            evicted = cache.evict(cache_size_mb)
+            cache.close()
+            write_log(f"{datetime.now()}: Evicted {evicted} sentences from the NER cache.", logfile)